@@ -13,6 +13,7 @@
 from .model.node_relax_props import NodeRelaxProps
 from .operators.node_relax_arrange import NodeRelaxArrange
 from .operators.node_relax_brush import NodeRelaxBrush
+from .operators.node_relax_export_stats import NodeRelaxExportStats
 from .panels.node_relax_arrange import NodeRelaxArrangePanel
 from .panels.node_relax_brush import NodeRelaxBrushPanel
 
@@ -44,6 +45,7 @@ def register():
     bpy.utils.register_class(NodeRelaxBrushPanel)
     bpy.utils.register_class(NodeRelaxArrange)
     bpy.utils.register_class(NodeRelaxArrangePanel)
+    bpy.utils.register_class(NodeRelaxExportStats)
     bpy.utils.register_class(NodeRelaxProps)
 
     bpy.types.Scene.NodeRelax_props = bpy.props.PointerProperty(type=NodeRelaxProps)
@@ -58,6 +60,7 @@ def unregister():
     bpy.utils.unregister_class(NodeRelaxBrushPanel)
     bpy.utils.unregister_class(NodeRelaxArrange)
     bpy.utils.unregister_class(NodeRelaxArrangePanel)
+    bpy.utils.unregister_class(NodeRelaxExportStats)
     bpy.utils.unregister_class(NodeRelaxProps)
     del bpy.types.Scene.NodeRelax_props
 
@@ -0,0 +1,50 @@
+"""Arrange every material, world, compositor and node group tree of a .blend file, without the UI.
+
+    blender --background scene.blend --python batch_arrange.py -- --jobs 8 --save
+
+Trees are solved in parallel on a process pool and written back in one pass.
+A timing summary per tree is printed at the end.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from operators.batch import Settings, apply_overrides, arrange_trees, collect_trees, summary  # noqa: E402
+
+
+def main():
+    # Imported here, worker processes load this file as their main module and have no bpy
+    import bpy
+
+    argv = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else []
+    parser = argparse.ArgumentParser(prog="batch_arrange.py", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--jobs", type=int, help="worker processes, all cores by default")
+    parser.add_argument("--prop", action="append", default=[], metavar="NAME=VALUE",
+                        help="override an arrange setting, e.g. --prop Distance=60")
+    parser.add_argument("--save", action="store_true", help="save the .blend file afterwards")
+    parser.add_argument("--output", help="save the result to this .blend file instead")
+    args = parser.parse_args(argv)
+
+    settings = Settings()
+    try:
+        apply_overrides(settings, args.prop)
+    except ValueError as error:
+        parser.error(str(error))
+
+    start = time.perf_counter()
+    trees = collect_trees(bpy.data)
+    rows = arrange_trees(trees, settings, args.jobs)
+    print(summary(rows, time.perf_counter() - start))
+
+    if args.output:
+        bpy.ops.wm.save_as_mainfile(filepath=os.path.abspath(args.output), copy=True)
+    elif args.save:
+        bpy.ops.wm.save_mainfile()
+
+
+if __name__ == "__main__":
+    main()
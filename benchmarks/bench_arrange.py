@@ -0,0 +1,99 @@
+"""Time the arrange solver on synthetic node trees, without Blender.
+
+Run from the add-on folder:
+
+    python -m benchmarks.bench_arrange --graphs chain,random_dag --sizes 100,1000,5000 --output bench.json
+
+The report is JSON, a readable summary goes to stderr.
+"""
+import argparse
+import json
+import math
+import platform
+import sys
+import time
+
+import numpy as np
+
+from operators.batch import Settings, apply_overrides
+from operators.snapshot import TreeSnapshot, link_tables, slot_tables
+from operators.solver import arrange
+
+from .graphs import GRAPHS
+
+
+def run_arrange(tree, props):
+    # Start from empty caches, like the first arrange of a tree
+    link_tables.clear()
+    slot_tables.clear()
+    result = {"graph": tree.name, "nodes": len(tree.nodes), "links": len(tree.links)}
+
+    start = time.perf_counter()
+    snap = TreeSnapshot(tree)
+    for _ in arrange(snap, props):
+        pass
+    snap.write_back()
+    result["total_seconds"] = time.perf_counter() - start
+    result.update(snap.stats.report())
+    return result
+
+
+def scaling_exponent(results):
+    # Slope of log(time) over log(nodes), 1 is linear and 2 quadratic
+    points = [(math.log(r["nodes"]), math.log(r["total_seconds"])) for r in results if r["total_seconds"] > 0]
+    if len(points) < 2:
+        return None
+    x, y = np.array(points).T
+    return float(np.polyfit(x, y, 1)[0])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--graphs", default=",".join(GRAPHS), help="comma separated, from: " + ", ".join(GRAPHS))
+    parser.add_argument("--sizes", default="100,300,1000,3000", help="comma separated node counts")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=1, help="runs per tree, the fastest is reported")
+    parser.add_argument("--iterations", type=int, default=200, help="maximum iterations of every stage")
+    parser.add_argument("--prop", action="append", default=[], metavar="NAME=VALUE",
+                        help="override an arrange setting, e.g. --prop ActiveSet=0")
+    parser.add_argument("--output", help="write the JSON report to this file instead of stdout")
+    args = parser.parse_args(argv)
+
+    props = Settings(Iterations_S1=args.iterations, Iterations_S2=args.iterations,
+                     Iterations_S3=args.iterations, Iterations_S4=args.iterations)
+    try:
+        apply_overrides(props, args.prop)
+    except ValueError as error:
+        parser.error(str(error))
+    report = {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "seed": args.seed,
+        "iterations": args.iterations,
+        "props": vars(props),
+        "results": [],
+        "scaling": {},
+    }
+
+    for name in args.graphs.split(","):
+        results = []
+        for size in (int(s) for s in args.sizes.split(",")):
+            runs = [run_arrange(GRAPHS[name](size, args.seed), props) for _ in range(args.repeat)]
+            result = min(runs, key=lambda r: r["total_seconds"])
+            result["graph"] = name
+            results.append(result)
+            stages = " ".join("%s %.2fs/%d" % (s["stage"], s["seconds"], s["iterations"]) for s in result["stages"])
+            print("%-12s %6d nodes %8.2fs  %s" % (name, size, result["total_seconds"], stages), file=sys.stderr)
+        report["results"] += results
+        report["scaling"][name] = scaling_exponent(results)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
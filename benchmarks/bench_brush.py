@@ -0,0 +1,95 @@
+"""Time the relax brush tick by tick, on strokes recorded in Blender or on a synthetic stroke.
+
+Run from the add-on folder:
+
+    python -m benchmarks.bench_brush node_relax_stroke.pkl --output brush.json
+    python -m benchmarks.bench_brush --graph random_dag --size 1000 --ticks 600
+
+Strokes are recorded with "Record Stroke" in the brush panel. The report is JSON with
+latency percentiles and the final layout of every stroke, a readable summary goes to stderr.
+"""
+import argparse
+import json
+import math
+import platform
+import sys
+
+import numpy as np
+
+from operators.snapshot import TreeSnapshot
+from operators.stroke import EVENT_FIELDS, FIELD, load_stroke, replay
+
+from .graphs import GRAPHS
+
+PERCENTILES = (50, 95, 99)
+
+
+def circle_stroke(snap, ticks, radius=300, turns=3):
+    # Brush held down while circling the middle of the tree, with the default brush settings
+    center = snap.pos[snap.movable].mean(axis=0)
+    spread = np.abs(snap.pos[snap.movable] - center).mean()
+    angle = np.linspace(0, 2 * math.pi * turns, ticks + 1)
+    cursor = center + spread * np.stack((np.cos(angle), np.sin(angle)), axis=1)
+
+    events = np.zeros((ticks, len(EVENT_FIELDS)), dtype=np.float32)
+    events[:, [FIELD["cursor_x"], FIELD["cursor_y"]]] = cursor[1:]
+    events[:, [FIELD["slide_x"], FIELD["slide_y"]]] = np.diff(cursor, axis=0)
+    events[:, FIELD["radius"]] = radius
+    events[:, FIELD["lmb"]] = 1
+    events[:, FIELD["dragging_node"]] = -1
+    events[:, FIELD["relax_power"]] = 0.1
+    events[:, FIELD["slide_power"]] = 0.6
+    events[:, FIELD["collision_power"]] = 0.9
+    events[:, FIELD["distance"]] = 80
+    return events
+
+
+def run_stroke(name, snap, events):
+    seconds = replay(snap, events)
+    result = {"stroke": name, "nodes": len(snap), "ticks": len(events), "total_seconds": float(seconds.sum())}
+    for p in PERCENTILES:
+        result["p%d_ms" % p] = float(np.percentile(seconds, p) * 1000) if len(seconds) else 0.0
+    result["max_ms"] = float(seconds.max() * 1000) if len(seconds) else 0.0
+    result["final_pos"] = snap.pos.tolist()
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("strokes", nargs="*", help="recorded stroke files")
+    parser.add_argument("--graph", choices=sorted(GRAPHS), help="replay a synthetic stroke on this kind of tree")
+    parser.add_argument("--size", type=int, default=1000, help="node count of the synthetic tree")
+    parser.add_argument("--ticks", type=int, default=600, help="ticks of the synthetic stroke")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the JSON report to this file instead of stdout")
+    args = parser.parse_args(argv)
+    if not args.strokes and not args.graph:
+        parser.error("give stroke files or --graph")
+
+    report = {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "results": [],
+    }
+    runs = [(path, *load_stroke(path)) for path in args.strokes]
+    if args.graph:
+        snap = TreeSnapshot(GRAPHS[args.graph](args.size, args.seed))
+        runs.append(("%s_%d" % (args.graph, args.size), snap, circle_stroke(snap, args.ticks)))
+
+    for name, snap, events in runs:
+        result = run_stroke(name, snap, events)
+        report["results"].append(result)
+        print("%-30s %6d nodes %5d ticks  p50 %.2fms  p95 %.2fms  p99 %.2fms  max %.2fms" % (
+            name[-30:], result["nodes"], result["ticks"], result["p50_ms"], result["p95_ms"],
+            result["p99_ms"], result["max_ms"]), file=sys.stderr)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""Synthetic node trees with the shapes that show up in real shader and geometry node setups"""
+import random
+
+from .standins import NodeTree
+
+NODE_WIDTHS = (140, 140, 150, 180, 240)
+SOCKET_HEIGHT = 22
+
+
+def add_node(tree, rng, spread, inputs, outputs):
+    width = rng.choice(NODE_WIDTHS)
+    height = 40 + SOCKET_HEIGHT * (inputs + outputs)
+    location = (rng.uniform(0, spread), rng.uniform(0, spread))
+    return tree.new_node("Node.%d" % len(tree.nodes), 'GROUP', inputs, outputs, (width, height), location)
+
+
+def link_free_input(tree, rng, from_node, to_node):
+    free = [s for s in to_node.inputs if not s.is_linked]
+    if free:
+        tree.new_link(rng.choice(from_node.outputs), rng.choice(free))
+
+
+def scattered(n):
+    # Side of the square the nodes start in, roughly the area they need once arranged
+    return 250 * n ** 0.5
+
+
+def chain(n, seed=0):
+    """Long processing chain with a few skip links"""
+    rng = random.Random(seed)
+    tree = NodeTree("chain_%d" % n)
+    spread = scattered(n)
+    nodes = [add_node(tree, rng, spread, rng.randint(2, 4), rng.randint(1, 2)) for _ in range(n)]
+    for i in range(1, n):
+        tree.new_link(nodes[i - 1].outputs[0], nodes[i].inputs[0])
+        if i > 5 and rng.random() < 0.2:
+            link_free_input(tree, rng, nodes[i - rng.randint(2, 5)], nodes[i])
+    return tree
+
+
+def fan_in(n, seed=0, fan=8):
+    """Reduction tree, every node collects the outputs of up to `fan` nodes"""
+    rng = random.Random(seed)
+    tree = NodeTree("fan_in_%d" % n)
+    spread = scattered(n)
+    nodes = [add_node(tree, rng, spread, fan, 1) for _ in range(n)]
+    for i in range(1, n):
+        parent = nodes[(i - 1) // fan]
+        tree.new_link(nodes[i].outputs[0], parent.inputs[(i - 1) % fan])
+    return tree
+
+
+def random_dag(n, seed=0, window=30):
+    """Random DAG where nodes mostly link to nodes created shortly before them"""
+    rng = random.Random(seed)
+    tree = NodeTree("random_dag_%d" % n)
+    spread = scattered(n)
+    nodes = [add_node(tree, rng, spread, rng.randint(1, 6), rng.randint(1, 3)) for _ in range(n)]
+    for i in range(1, n):
+        for _ in range(rng.randint(1, 3)):
+            link_free_input(tree, rng, nodes[rng.randrange(max(0, i - window), i)], nodes[i])
+    return tree
+
+
+def deep_frames(n, seed=0, depth=4, branching=3):
+    """Random DAG with its nodes spread over frames nested `depth` levels deep"""
+    tree = random_dag(n, seed)
+    tree.name = "deep_frames_%d" % n
+    rng = random.Random(seed)
+
+    level = [None]
+    for _ in range(depth):
+        frames = []
+        for parent in level:
+            for _ in range(branching):
+                frame = tree.new_node("Frame.%d" % len(tree.nodes), 'FRAME', dimensions=(400, 300),
+                                      location=(rng.uniform(-50, 50), rng.uniform(-50, 50)))
+                frame.parent = parent
+                frames.append(frame)
+        level = frames
+
+    for node in tree.nodes:
+        if node.type != 'FRAME' and rng.random() < 0.8:
+            node.parent = rng.choice(level)
+    return tree
+
+
+def islands(n, seed=0, size=25):
+    """Many small unlinked random DAGs, like a compositor tree or a node group library"""
+    rng = random.Random(seed)
+    tree = NodeTree("islands_%d" % n)
+    spread = scattered(n)
+    nodes = [add_node(tree, rng, spread, rng.randint(1, 4), rng.randint(1, 2)) for _ in range(n)]
+    for i in range(1, n):
+        first = i - i % size
+        if i > first:
+            link_free_input(tree, rng, nodes[rng.randrange(first, i)], nodes[i])
+    return tree
+
+
+def rerouted(n, seed=0, window=30, share=0.3):
+    """Random DAG where about `share` of the nodes are reroutes along its links, a few of them branching"""
+    rng = random.Random(seed)
+    tree = NodeTree("rerouted_%d" % n)
+    spread = scattered(n)
+    real = max(2, int(n * (1 - share)))
+    nodes = [add_node(tree, rng, spread, rng.randint(1, 6), rng.randint(1, 3)) for _ in range(real)]
+    budget = n - real
+    reroutes = []
+    for i in range(1, real):
+        for _ in range(rng.randint(1, 2)):
+            free = [s for s in nodes[i].inputs if not s.is_linked]
+            if not free:
+                break
+            if reroutes and rng.random() < 0.1:
+                source = rng.choice(reroutes[-window:]).outputs[0]
+            else:
+                source = rng.choice(nodes[rng.randrange(max(0, i - window), i)].outputs)
+            for _ in range(min(budget, rng.randint(0, 3))):
+                location = (rng.uniform(0, spread), rng.uniform(0, spread))
+                reroute = tree.new_node("Reroute.%d" % len(tree.nodes), 'REROUTE', 1, 1, (16, 16), location)
+                tree.new_link(source, reroute.inputs[0])
+                source = reroute.outputs[0]
+                reroutes.append(reroute)
+                budget -= 1
+            tree.new_link(source, rng.choice(free))
+    return tree
+
+
+GRAPHS = {
+    "chain": chain,
+    "fan_in": fan_in,
+    "random_dag": random_dag,
+    "deep_frames": deep_frames,
+    "islands": islands,
+    "rerouted": rerouted,
+}
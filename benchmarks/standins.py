@@ -0,0 +1,61 @@
+"""Plain Python stand-ins for the parts of bpy node trees the solver reads"""
+
+
+class Socket:
+    def __init__(self, node, name):
+        self.node = node
+        self.name = name
+        self.links = []
+
+    @property
+    def is_linked(self):
+        return len(self.links) > 0
+
+    def as_pointer(self):
+        return id(self)
+
+
+class Link:
+    def __init__(self, from_socket, to_socket):
+        self.from_node = from_socket.node
+        self.from_socket = from_socket
+        self.to_node = to_socket.node
+        self.to_socket = to_socket
+
+
+class Node:
+    def __init__(self, name, node_type='GROUP', inputs=0, outputs=0, dimensions=(140, 100), location=(0, 0)):
+        self.name = name
+        self.type = node_type
+        self.location = list(location)
+        self.dimensions = tuple(dimensions)
+        self.parent = None
+        self.select = False
+        self.inputs = [Socket(self, "Input %d" % i) for i in range(inputs)]
+        self.outputs = [Socket(self, "Output %d" % i) for i in range(outputs)]
+
+    def as_pointer(self):
+        return id(self)
+
+
+class NodeTree:
+    def __init__(self, name):
+        self.name = name
+        self.nodes = []
+        self.links = []
+
+    def as_pointer(self):
+        return id(self)
+
+    def new_node(self, *args, **kwargs):
+        node = Node(*args, **kwargs)
+        self.nodes.append(node)
+        return node
+
+    def new_link(self, from_socket, to_socket):
+        link = Link(from_socket, to_socket)
+        from_socket.links.append(link)
+        to_socket.links.append(link)
+        self.links.append(link)
+        return link
+
@@ -26,12 +26,41 @@ class NodeRelaxProps(bpy.types.PropertyGroup):
         min=0,
         max=1,
         default=0.9)
+    BrushRate: bpy.props.IntProperty(
+        name="Brush Rate",
+        description="Brush updates per second, independent of how often the mouse reports movement",
+        min=10,
+        max=240,
+        default=60)
+    RecordBrush: bpy.props.BoolProperty(
+        name="Record Stroke",
+        description="Save the brush ticks and the starting layout to the stroke file, to replay them in the brush benchmark",
+        default=False)
+    BrushStrokeFile: bpy.props.StringProperty(
+        name="Stroke File",
+        description="File the recorded stroke is written to when the brush ends",
+        subtype='FILE_PATH',
+        default="//node_relax_stroke.pkl")
+    ShowStats: bpy.props.BoolProperty(
+        name="Show Stats",
+        description="Show solver timings and counters while the brush is active",
+        default=False)
 
     #### Arrange settings
 
     ArrangeOnlySelected: bpy.props.BoolProperty(
         name="Only Selected",
         default=False)
+    Incremental: bpy.props.BoolProperty(
+        name="Only Changed",
+        description="Arrange only the nodes added, moved, resized or relinked since the last arrange of this tree, "
+                    "and their close neighbours. Everything else stays in place",
+        default=False)
+    WarmStart: bpy.props.BoolProperty(
+        name="Warm Start",
+        description="Start from the last finished arrange of this tree. If no node was added, resized or relinked "
+                    "since, only the overlaps are solved again, and nothing runs if the tree is unchanged",
+        default=False)
     Iterations_S1: bpy.props.IntProperty(
         name="Step 1",
         min=0,
@@ -51,9 +80,62 @@ class NodeRelaxProps(bpy.types.PropertyGroup):
     AdaptiveIters: bpy.props.BoolProperty(
         name="Adaptive Iterations",
         default=True)
-    BackgroundIterations: bpy.props.IntProperty(
-        name="Background Iterations",
-        min=0,
-        max=10,
-        default=2)
+    AutoSchedule: bpy.props.BoolProperty(
+        name="Auto Schedule",
+        description="Pick the length and step size of every stage from the node count and how fast it converges. "
+                    "The iteration counts above only limit the stages",
+        default=False)
+    ActiveSet: bpy.props.BoolProperty(
+        name="Skip Settled Nodes",
+        description="Stop solving nodes that stopped moving until a linked or colliding node moves",
+        default=False)
+    LayeredStart: bpy.props.BoolProperty(
+        name="Layered Start",
+        description="Replace step 1 with a single pass placing the nodes in columns along the links",
+        default=False)
+    SweepStage3: bpy.props.BoolProperty(
+        name="Sweep Step 3",
+        description="Replace step 3 with a single top to bottom sweep that separates nodes overlapping vertically",
+        default=False)
+    SplitComponents: bpy.props.BoolProperty(
+        name="Split Islands",
+        description="Arrange groups of nodes that are not linked to each other separately, "
+                    "then pack them in rows in their original order",
+        default=False)
+    NestedFrames: bpy.props.BoolProperty(
+        name="Nested Frames",
+        description="Arrange the contents of every frame on their own, innermost frames first, "
+                    "then move each frame as one block in the layout around it",
+        default=False)
+    CollapseReroutes: bpy.props.BoolProperty(
+        name="Collapse Reroutes",
+        description="Solve the tree with chains of reroutes replaced by direct links, then line the reroutes up "
+                    "along those links. Only used when the whole tree is arranged without Nested Frames",
+        default=False)
+    Multilevel: bpy.props.BoolProperty(
+        name="Multilevel",
+        description="Lay out a coarsened tree with chains and clusters merged first, then refine it "
+                    "level by level. Much faster for very large trees",
+        default=False)
+    BackgroundSolve: bpy.props.BoolProperty(
+        name="Solve in Background",
+        description="Run the solver on a separate thread and only show its progress, "
+                    "so the editors stay usable while large trees are arranged",
+        default=False)
+    TickBudget: bpy.props.FloatProperty(
+        name="Time Budget (ms)",
+        description="Solver time per update of the node editor, lower keeps the editor more responsive",
+        min=1,
+        soft_max=100,
+        default=20)
+    UseLayoutCache: bpy.props.BoolProperty(
+        name="Reuse Layouts",
+        description="Apply the stored layout of an earlier arranged tree with the same links, node sizes and "
+                    "settings instead of solving again",
+        default=False)
+    LayoutCacheDir: bpy.props.StringProperty(
+        name="Layout Folder",
+        description="Keep the reused layouts in this folder across sessions, leave empty to keep them in memory only",
+        subtype='DIR_PATH',
+        default="")
     ArrangeState: bpy.props.StringProperty(default="")
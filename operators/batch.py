@@ -0,0 +1,114 @@
+"""Arrange many node trees at once on a process pool. Needs no bpy, trees are passed in"""
+import concurrent.futures
+import json
+import time
+
+from .snapshot import TreeSnapshot
+from .solver import arrange
+
+
+class Settings:
+    """Arrange settings as a plain picklable object, with the defaults of NodeRelaxProps"""
+
+    def __init__(self, **overrides):
+        self.Distance = 80.0
+        self.ArrangeOnlySelected = False
+        self.Incremental = False
+        self.WarmStart = False
+        self.Iterations_S1 = 200
+        self.Iterations_S2 = 200
+        self.Iterations_S3 = 200
+        self.Iterations_S4 = 200
+        self.AdaptiveIters = True
+        self.AutoSchedule = False
+        self.ActiveSet = False
+        self.LayeredStart = False
+        self.SweepStage3 = False
+        self.Multilevel = False
+        self.SplitComponents = False
+        self.NestedFrames = False
+        self.CollapseReroutes = False
+        for key, value in overrides.items():
+            if not hasattr(self, key):
+                raise AttributeError("Unknown arrange setting: %s" % key)
+            setattr(self, key, value)
+
+    @classmethod
+    def from_props(cls, props):
+        # Copy of the scene settings that is safe to read from other threads and processes
+        return cls(**{key: getattr(props, key) for key in vars(cls())})
+
+
+def apply_overrides(settings, overrides):
+    """Set the NAME=VALUE strings of a command line on settings, values are JSON.
+
+    Raises ValueError for unknown names and for values that do not fit the type of the setting.
+    """
+    for override in overrides:
+        name, sep, text = override.partition("=")
+        if not sep:
+            raise ValueError("expected NAME=VALUE, got %s" % override)
+        if not hasattr(settings, name):
+            raise ValueError("unknown arrange setting: %s" % name)
+        default = getattr(settings, name)
+        try:
+            value = json.loads(text)
+        except ValueError:
+            raise ValueError("%s: %s is not a JSON value" % (name, text)) from None
+        if isinstance(default, bool) and value in (0, 1):
+            value = bool(value)
+        elif isinstance(default, float) and isinstance(value, (int, float)) and not isinstance(value, bool):
+            value = float(value)
+        elif type(value) is not type(default):
+            raise ValueError("%s takes a value of type %s, got %s" % (name, type(default).__name__, text))
+        setattr(settings, name, value)
+
+
+def collect_trees(data):
+    """(kind, name, tree) of every local node tree in bpy.data"""
+    found = []
+    for material in data.materials:
+        found.append(("MATERIAL", material.name, material.node_tree))
+    for world in data.worlds:
+        found.append(("WORLD", world.name, world.node_tree))
+    for scene in data.scenes:
+        found.append(("COMPOSITOR", scene.name, scene.node_tree))
+    for group in data.node_groups:
+        found.append(("NODE_GROUP", group.name, group))
+    # Trees of linked libraries are read only
+    return [(kind, name, tree) for kind, name, tree in found
+            if tree is not None and tree.library is None and len(tree.nodes)]
+
+
+def solve(snap, settings):
+    # Runs in a worker process, only the positions and stats go back
+    start = time.perf_counter()
+    for _ in arrange(snap, settings):
+        pass
+    return snap.pos, snap.stats, time.perf_counter() - start
+
+
+def arrange_trees(trees, settings, jobs=None):
+    """Arrange all trees, in parallel on `jobs` processes (all cores if None), and write the result back.
+
+    Returns one summary row per tree: kind, name, node count, solve seconds and written nodes.
+    """
+    snapshots = [TreeSnapshot(tree) for _, _, tree in trees]
+    rows = []
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as pool:
+        results = list(pool.map(solve, snapshots, [settings] * len(snapshots)))
+
+    for (kind, name, _), snap, (pos, stats, seconds) in zip(trees, snapshots, results):
+        stats.snapshot_seconds = snap.stats.snapshot_seconds
+        snap.pos = pos
+        snap.stats = stats
+        rows.append((kind, name, len(snap), seconds, snap.write_back()))
+    return rows
+
+
+def summary(rows, wall_seconds):
+    lines = ["%-12s %-40s %6s %9s %8s" % ("Kind", "Tree", "Nodes", "Seconds", "Written")]
+    for kind, name, nodes, seconds, written in sorted(rows, key=lambda row: -row[3]):
+        lines.append("%-12s %-40s %6d %9.3f %8d" % (kind, name[:40], nodes, seconds, written))
+    lines.append("%d trees, %.2fs solving, %.2fs wall time" % (len(rows), sum(row[3] for row in rows), wall_seconds))
+    return "\n".join(lines)
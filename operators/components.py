@@ -0,0 +1,140 @@
+import numpy as np
+
+from .snapshot import LinkTable
+
+# Width over height of the area the packed components fill, node trees read left to right
+PACK_ASPECT = 2.0
+# Room around a part of the tree, in node distances, in which other nodes are kept as obstacles
+PART_MARGIN = 2
+
+
+def connected_components(snap, idx):
+    """Nodes of idx split into groups linked to each other, largest group first"""
+    links = snap.links
+    solved = np.zeros(len(snap), dtype=bool)
+    solved[idx] = True
+    use = solved[links.src] & solved[links.dst]
+    src = links.src[use]
+    dst = links.dst[use]
+
+    # Every node points to the smallest node index it is known to be connected to
+    label = np.arange(len(snap))
+    while True:
+        low = np.minimum(label[src], label[dst])
+        np.minimum.at(label, label[src], low)
+        np.minimum.at(label, label[dst], low)
+        while True:
+            jumped = label[label]
+            if (jumped == label).all():
+                break
+            label = jumped
+        if (label[src] == label[dst]).all():
+            break
+
+    order = np.argsort(label[idx], kind='stable')
+    nodes = idx[order]
+    groups = np.split(nodes, np.flatnonzero(np.diff(label[nodes])) + 1)
+    return sorted(groups, key=len, reverse=True)
+
+
+def surroundings(snap, idx, distance):
+    """Nodes outside idx that the nodes of idx pull on or may bump into: their link neighbours and the nodes near"""
+    near = snap.links.neighbours(idx)
+    pos = snap.pos[idx]
+    size = snap.size[idx]
+    margin = PART_MARGIN * distance
+    left = pos[:, 0].min() - margin
+    top = pos[:, 1].max() + margin
+    right = (pos[:, 0] + size[:, 0]).max() + margin
+    bottom = (pos[:, 1] - size[:, 1]).min() - margin
+
+    movable = snap.movable
+    pos = snap.pos[movable]
+    size = snap.size[movable]
+    inside = (pos[:, 0] < right) & (pos[:, 0] + size[:, 0] > left) & (pos[:, 1] > bottom) & (pos[:, 1] - size[:, 1] < top)
+    return np.setdiff1d(np.union1d(near, movable[inside]), idx)
+
+
+class SubTree:
+    """Some nodes of a snapshot, with their frames and the links between them, solved as a tree of their own"""
+
+    def __init__(self, snap, nodes):
+        self.snap = snap
+        self.stats = snap.stats
+
+        # The frames around the nodes come along, links between siblings stay siblings
+        frames = [np.zeros(0, dtype=np.int64)]
+        level = snap.parent[nodes]
+        while len(level):
+            level = np.unique(level[level >= 0])
+            frames.append(level)
+            level = snap.parent[level]
+        self.members = np.concatenate((nodes, np.unique(np.concatenate(frames))))
+        index = np.full(len(snap), -1, dtype=np.int64)
+        index[self.members] = np.arange(len(self.members))
+
+        self.pos = snap.pos[self.members].copy()
+        self.size = snap.size[self.members]
+        parent = snap.parent[self.members]
+        self.parent = np.where(parent >= 0, index[parent], -1)
+        self.is_frame = snap.is_frame[self.members]
+        self.movable = np.flatnonzero(~self.is_frame)
+
+        links = snap.links
+        use = (index[links.src] >= 0) & (index[links.dst] >= 0)
+        self.links = LinkTable(len(self.members), index[links.src[use]], index[links.dst[use]],
+                               links.src_socket[use], links.dst_socket[use],
+                               links.src_slot[use], links.dst_slot[use], links.siblings[use])
+
+    def __len__(self):
+        return len(self.members)
+
+    def solve_indices(self, only_selected):
+        return self.movable
+
+    def bounds(self):
+        # Top left corner and size of the box around the nodes
+        pos = self.pos[self.movable]
+        size = self.size[self.movable]
+        left = pos[:, 0].min()
+        top = pos[:, 1].max()
+        right = (pos[:, 0] + size[:, 0]).max()
+        bottom = (pos[:, 1] - size[:, 1]).min()
+        return np.array((left, top)), np.array((right - left, top - bottom))
+
+    def commit(self, shift):
+        # Copy the solved positions back, moved by shift
+        nodes = self.members[self.movable]
+        self.snap.pos[nodes] = self.pos[self.movable] + shift
+
+
+def pack(sizes, centers, distance):
+    """Top left corners for boxes of the given sizes, in rows that keep the order of the box centers.
+
+    Boxes are taken from top to bottom into rows about as wide as the area needs,
+    and ordered from left to right within a row.
+    """
+    area = ((sizes + distance).prod(axis=1)).sum()
+    row_width = max(sizes[:, 0].max(), (area * PACK_ASPECT) ** 0.5)
+
+    rows = []
+    row = []
+    width = 0
+    for i in np.argsort(-centers[:, 1], kind='stable').tolist():
+        if row and width + sizes[i, 0] > row_width:
+            rows.append(row)
+            row = []
+            width = 0
+        row.append(i)
+        width += sizes[i, 0] + distance
+    rows.append(row)
+
+    corners = np.zeros_like(sizes)
+    top = 0
+    for row in rows:
+        left = 0
+        for i in sorted(row, key=lambda i: centers[i, 0]):
+            corners[i] = (left, top)
+            left += sizes[i, 0] + distance
+        top -= max(sizes[i, 1] for i in row) + distance
+    return corners
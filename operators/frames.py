@@ -0,0 +1,97 @@
+import numpy as np
+
+from .snapshot import LinkTable
+
+# Space between a frame's border and its nodes, and the extra room for its label on top
+FRAME_PADDING = 20
+FRAME_LABEL = 30
+
+
+def direct_children(snap, frame):
+    if frame < 0:
+        return np.flatnonzero(snap.parent < 0)
+    return snap.children[snap.child_ptr[frame]:snap.child_ptr[frame + 1]]
+
+
+class FrameLevel:
+    """Direct children of a frame (or the top level for -1) as a tree of their own.
+
+    Nodes stay nodes, every child frame becomes one rigid block as large as the
+    box around its nodes. Links of nodes inside a block are moved to the block.
+    """
+
+    def __init__(self, snap, frame):
+        self.snap = snap
+        self.stats = snap.stats
+        children = direct_children(snap, frame)
+        nodes = children[~snap.is_frame[children]]
+        blocks = []
+        contents = []
+        for child in children[snap.is_frame[children]].tolist():
+            inside = snap.descendants(child)
+            inside = inside[~snap.is_frame[inside]]
+            if len(inside):
+                blocks.append(child)
+                contents.append(inside)
+        self.nodes = nodes
+        self.blocks = np.array(blocks, dtype=np.int64)
+        self.items = np.concatenate((nodes, self.blocks))
+
+        # Every node of the tree that is placed by this level -> its item
+        self.map = np.full(len(snap), -1, dtype=np.int64)
+        self.map[nodes] = np.arange(len(nodes))
+        self.pos = np.zeros((len(self.items), 2))
+        self.size = np.zeros((len(self.items), 2))
+        self.pos[:len(nodes)] = snap.pos[nodes]
+        self.size[:len(nodes)] = snap.size[nodes]
+        for i, inside in enumerate(contents, len(nodes)):
+            self.map[inside] = i
+            pos = snap.pos[inside]
+            size = snap.size[inside]
+            left = pos[:, 0].min() - FRAME_PADDING
+            top = pos[:, 1].max() + FRAME_PADDING + FRAME_LABEL
+            right = (pos[:, 0] + size[:, 0]).max() + FRAME_PADDING
+            bottom = (pos[:, 1] - size[:, 1]).min() - FRAME_PADDING
+            self.pos[i] = (left, top)
+            self.size[i] = (right - left, top - bottom)
+        self.start = self.pos.copy()
+
+        self.parent = np.full(len(self.items), -1, dtype=np.int64)
+        self.is_frame = np.zeros(len(self.items), dtype=bool)
+        self.movable = np.arange(len(self.items))
+        self.links = self.level_links()
+
+    def level_links(self):
+        # Links between different items, with the sockets moved to their height in the block
+        snap = self.snap
+        links = snap.links
+        src = links.src
+        dst = links.dst
+        use = (self.map[src] >= 0) & (self.map[dst] >= 0) & (self.map[src] != self.map[dst])
+        src = src[use]
+        dst = dst[use]
+        src_i = self.map[src]
+        dst_i = self.map[dst]
+        local_src = self.pos[src_i, 1] - snap.pos[src, 1]
+        local_dst = self.pos[dst_i, 1] - snap.pos[dst, 1]
+        src_slot = (links.src_slot[use] * snap.size[src, 1] + local_src) / self.size[src_i, 1]
+        dst_slot = (links.dst_slot[use] * snap.size[dst, 1] + local_dst) / self.size[dst_i, 1]
+        return LinkTable(len(self.items), src_i, dst_i, links.src_socket[use], links.dst_socket[use],
+                         src_slot, dst_slot, np.ones(len(src_i), dtype=bool))
+
+    def __len__(self):
+        return len(self.items)
+
+    def commit(self):
+        # Nodes take their new place, blocks move their frame with everything in it
+        count = len(self.nodes)
+        self.snap.pos[self.nodes] = self.pos[:count]
+        for block, delta in zip(self.blocks.tolist(), self.pos[count:] - self.start[count:]):
+            self.snap.move_frame(block, delta)
+
+
+def nested_order(snap):
+    """Frames from the innermost to the outermost, then -1 for the top level"""
+    frames = np.flatnonzero(snap.is_frame)
+    frames = frames[np.argsort(-snap.depth[frames], kind='stable')]
+    return frames.tolist() + [-1]
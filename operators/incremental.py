@@ -0,0 +1,70 @@
+import numpy as np
+
+# Link hops around the changed nodes that are solved again with them
+HALO_LINKS = 2
+# Movement below this is not a change, locations are stored as 32 bit floats
+TOLERANCE = 0.01
+
+# Tree pointer -> ArrangedState of the last finished arrange
+arranged_states = {}
+
+
+def link_keys(snap, pointers):
+    links = snap.links
+    return list(zip(pointers[links.src].tolist(), links.src_socket.tolist(),
+                    pointers[links.dst].tolist(), links.dst_socket.tolist()))
+
+
+class ArrangedState:
+    """Node rectangles and links of a tree right after it was arranged, and the settings used"""
+
+    def __init__(self, snap, settings=None):
+        self.settings = settings
+        self.pointers = np.array([node.as_pointer() for node in snap.nodes], dtype=np.int64)
+        self.pos = snap.pos.copy()
+        self.size = snap.size.copy()
+        self.links = set(link_keys(snap, self.pointers))
+
+    def changed_nodes(self, snap):
+        """Mask of the nodes that are new, moved or resized, or gained or lost a link since the state was taken"""
+        moved, resized, relinked = self.changes(snap)
+        return moved | resized | relinked
+
+    def changes(self, snap):
+        """Masks of the moved nodes, the new or resized ones and the ones that gained or lost a link"""
+        pointers = np.array([node.as_pointer() for node in snap.nodes], dtype=np.int64)
+        index = {p: i for i, p in enumerate(self.pointers.tolist())}
+        old = np.array([index.get(p, -1) for p in pointers.tolist()], dtype=np.int64)
+        known = old >= 0
+
+        moved = np.zeros(len(snap), dtype=bool)
+        moved[known] = (np.abs(snap.pos[known] - self.pos[old[known]]) > TOLERANCE).any(axis=1)
+        resized = ~known
+        resized[known] |= (np.abs(snap.size[known] - self.size[old[known]]) > TOLERANCE).any(axis=1)
+
+        # Both ends of new links, and the remaining end of removed ones
+        keys = link_keys(snap, pointers)
+        new = np.array([key not in self.links for key in keys], dtype=bool)
+        relinked = np.zeros(len(snap), dtype=bool)
+        relinked[snap.links.src[new]] = True
+        relinked[snap.links.dst[new]] = True
+        current = set(keys)
+        position = {p: i for i, p in enumerate(pointers.tolist())}
+        for src, _, dst, _ in self.links - current:
+            for p in (src, dst):
+                if p in position:
+                    relinked[position[p]] = True
+        return moved, resized, relinked
+
+
+def changed_region(snap, state, idx):
+    """Nodes of idx that changed since the state was taken, with the nodes up to HALO_LINKS links away"""
+    region = state.changed_nodes(snap)
+    seeds = np.flatnonzero(region)
+    for _ in range(HALO_LINKS):
+        if len(seeds) == 0:
+            break
+        seeds = snap.links.neighbours(seeds)
+        seeds = seeds[~region[seeds]]
+        region[seeds] = True
+    return idx[region[idx]]
@@ -0,0 +1,131 @@
+import numpy as np
+
+from .snapshot import concat_ranges, csr
+
+
+def solved_links(snap, idx):
+    # Links between two solved nodes
+    solved = np.zeros(len(snap), dtype=bool)
+    solved[idx] = True
+    links = snap.links
+    use = solved[links.src] & solved[links.dst] & (links.src != links.dst)
+    return np.flatnonzero(use)
+
+
+def layer_ranks(snap, idx, used):
+    """Longest path to a node without outputs, 0 for the rightmost layer"""
+    n = len(snap)
+    src = snap.links.src[used]
+    dst = snap.links.dst[used]
+    in_order, in_ptr = csr(dst, n)
+    remaining = np.bincount(src, minlength=n)
+    rank = np.full(n, -1, dtype=np.int64)
+
+    # A node gets its layer once all nodes it links to have one
+    frontier = idx[remaining[idx] == 0]
+    level = 0
+    while len(frontier):
+        rank[frontier] = level
+        start = in_ptr[frontier]
+        upstream = src[in_order[concat_ranges(start, in_ptr[frontier + 1] - start)]]
+        np.subtract.at(remaining, upstream, 1)
+        upstream = np.unique(upstream)
+        frontier = upstream[remaining[upstream] == 0]
+        level += 1
+
+    # Nodes on or behind a link cycle never get a layer, put them left of all others
+    rank[idx[rank[idx] < 0]] = level
+    return rank
+
+
+def stack_column(desired, heights, distance):
+    """Tops of nodes sorted from top to bottom, pushed apart to keep `distance` between them.
+
+    Every node is as close to its desired top as the nodes above allow, then
+    the column is shifted to spread the push instead of only moving nodes down.
+    """
+    # With gap the stacked height above a node, top = min(desired + gap over the nodes above) - gap
+    gap = np.concatenate(([0], np.cumsum(heights[:-1] + distance)))
+    top = np.minimum.accumulate(desired + gap) - gap
+    return top + (desired - top).mean()
+
+
+def x_columns(snap, idx):
+    """Column number of every node in idx, nodes that overlap horizontally share a column"""
+    left = snap.pos[idx, 0]
+    right = left + snap.size[idx, 0]
+    order = np.argsort(left, kind='stable')
+    reach = np.maximum.accumulate(right[order])
+    column = np.empty(len(idx), dtype=np.int64)
+    column[order] = np.concatenate(([0], np.cumsum(left[order][1:] >= reach[:-1])))
+    return column
+
+
+def sweep_y_overlaps(snap, idx, distance):
+    """Push the nodes apart vertically in one sweep from top to bottom.
+
+    A skyline over the node edges holds the lowest bottom so far at every x, each
+    node is placed below the part of it the node overlaps. Afterwards every column
+    is shifted back by the average push of its nodes.
+    """
+    pos = snap.pos
+    left = pos[idx, 0]
+    right = left + snap.size[idx, 0]
+    edges = np.unique(np.concatenate((left, right)))
+    first = np.searchsorted(edges, left).tolist()
+    last = np.searchsorted(edges, right).tolist()
+    desired = pos[idx, 1]
+    bottom = (snap.size[idx, 1] + distance).tolist()
+
+    top = desired.tolist()
+    skyline = np.full(len(edges), np.inf)
+    for i in np.argsort(-desired, kind='stable').tolist():
+        a = first[i]
+        b = last[i]
+        if a < b:
+            top[i] = min(top[i], skyline[a:b].min())
+            skyline[a:b] = top[i] - bottom[i]
+    top = np.array(top)
+
+    column = x_columns(snap, idx)
+    shift = np.bincount(column, desired - top) / np.bincount(column)
+    pos[idx, 1] = top + shift[column]
+
+
+def place_layers(snap, idx, distance):
+    """Place the nodes in columns by layer, right to left, in a single pass.
+
+    Within a column nodes are sorted and placed by the height of the sockets
+    they link to in the columns already placed, then pushed apart downwards.
+    """
+    links = snap.links
+    pos = snap.pos
+    size = snap.size
+    used = solved_links(snap, idx)
+    rank = layer_ranks(snap, idx, used)[idx]
+    layer_order, layer_ptr = csr(rank, rank.max() + 1)
+
+    # Columns are as wide as their widest node, nodes are right aligned to the next column
+    width = np.zeros(len(layer_ptr) - 1)
+    np.maximum.at(width, rank, size[idx, 0])
+    right = -np.concatenate(([0], np.cumsum(width[:-1] + distance)))
+    pos[idx, 0] = right[rank] - size[idx, 0]
+
+    src = links.src[used]
+    dst = links.dst[used]
+    out_order, out_ptr = csr(src, len(snap))
+    for layer in range(len(width)):
+        nodes = idx[layer_order[layer_ptr[layer]:layer_ptr[layer + 1]]]
+        start = out_ptr[nodes]
+        count = out_ptr[nodes + 1] - start
+        out = used[out_order[concat_ranges(start, count)]]
+        owner = np.repeat(np.arange(len(nodes)), count)
+        # Height that lines the socket up with the linked socket, as in the relax stages
+        other = links.dst[out]
+        target = pos[other, 1] - links.dst_slot[out] * size[other, 1] + links.src_slot[out] * size[nodes[owner], 1]
+        linked = count > 0
+        desired = pos[nodes, 1].copy()
+        desired[linked] = np.bincount(owner, target, minlength=len(nodes))[linked] / count[linked]
+
+        sort = np.argsort(-desired, kind='stable')
+        pos[nodes[sort], 1] = stack_column(desired[sort], size[nodes[sort], 1], distance)
@@ -0,0 +1,140 @@
+import collections
+import hashlib
+import os
+
+import numpy as np
+
+# Layouts kept, the least recently used one is dropped first
+MAX_ENTRIES = 512
+# Node sizes are rounded to this in the key, so float noise does not split layouts
+SIZE_STEP = 1.0
+# Rounds of label refinement over the links, nodes that still share a label are ordered as in the tree
+LABEL_ROUNDS = 3
+# Settings that change the result of arranging a whole tree
+KEY_PROPS = ("Distance", "Iterations_S1", "Iterations_S2", "Iterations_S3", "Iterations_S4", "AdaptiveIters",
+             "AutoSchedule", "ActiveSet", "LayeredStart", "SweepStage3", "Multilevel",
+             "SplitComponents", "NestedFrames", "CollapseReroutes")
+
+
+def canonical_order(snap):
+    """Node indices in an order that only depends on node sizes, frames and links, not on names or tree order"""
+    links = snap.links
+    size = np.round(snap.size / SIZE_STEP).astype(np.int64).tolist()
+    labels = [hash((w, h, frame)) for (w, h), frame in zip(size, snap.is_frame.tolist())]
+    src = links.src.tolist()
+    dst = links.dst.tolist()
+    src_socket = links.src_socket.tolist()
+    dst_socket = links.dst_socket.tolist()
+    for _ in range(LABEL_ROUNDS):
+        # Every node takes on the labels of its linked nodes and the sockets they connect
+        inputs = [[] for _ in labels]
+        outputs = [[] for _ in labels]
+        for a, b, sa, sb in zip(src, dst, src_socket, dst_socket):
+            inputs[b].append((labels[a], sa, sb))
+            outputs[a].append((labels[b], sa, sb))
+        parent = [labels[p] if p >= 0 else 0 for p in snap.parent.tolist()]
+        labels = [hash((label, p, tuple(sorted(i)), tuple(sorted(o))))
+                  for label, p, i, o in zip(labels, parent, inputs, outputs)]
+    return np.array(sorted(range(len(labels)), key=labels.__getitem__), dtype=np.int64)
+
+
+def layout_key(snap, order, props):
+    """Hash of the tree structure in canonical order together with the arrange settings"""
+    rank = np.empty(len(order), dtype=np.int64)
+    rank[order] = np.arange(len(order))
+    links = snap.links
+    link_list = sorted(zip(rank[links.src].tolist(), links.src_socket.tolist(),
+                           rank[links.dst].tolist(), links.dst_socket.tolist()))
+    parent = snap.parent[order]
+    structure = (
+        np.round(snap.size[order] / SIZE_STEP).astype(np.int64).tolist(),
+        snap.is_frame[order].tolist(),
+        np.where(parent >= 0, rank[parent], -1).tolist(),
+        link_list,
+        [getattr(props, name) for name in KEY_PROPS],
+    )
+    return hashlib.sha1(repr(structure).encode()).hexdigest()
+
+
+class LayoutCache:
+    """Arranged node positions by layout key, relative to the center of the movable nodes, in canonical order.
+
+    With a folder set every layout is also kept there in a file of its own, so storing one
+    does not rewrite the others. Folders that cannot be read or written leave the cache in memory only.
+    """
+
+    def __init__(self):
+        self.entries = collections.OrderedDict()
+        self.path = ""
+
+    def use_dir(self, path):
+        self.path = path
+
+    def entry_path(self, key):
+        return os.path.join(self.path, key + ".npy")
+
+    def lookup(self, key):
+        positions = self.entries.get(key)
+        if positions is not None:
+            self.entries.move_to_end(key)
+        elif self.path:
+            positions = self.load(key)
+        return positions
+
+    def load(self, key):
+        path = self.entry_path(key)
+        if not os.path.isfile(path):
+            return None
+        try:
+            positions = np.load(path)
+            os.utime(path)  # The folder drops the least recently used files first too
+        except (OSError, ValueError, EOFError):
+            return None
+        self.remember_entry(key, positions)
+        return positions
+
+    def store(self, key, positions):
+        self.remember_entry(key, positions)
+        if self.path:
+            try:
+                self.write(key, positions)
+            except OSError:
+                self.path = ""
+
+    def remember_entry(self, key, positions):
+        self.entries[key] = positions
+        self.entries.move_to_end(key)
+        while len(self.entries) > MAX_ENTRIES:
+            self.entries.popitem(last=False)
+
+    def write(self, key, positions):
+        os.makedirs(self.path, exist_ok=True)
+        # Written next to its place first, so a cut off write never leaves a truncated layout behind
+        temp = self.entry_path(key) + ".tmp"
+        with open(temp, "wb") as f:
+            np.save(f, positions)
+        os.replace(temp, self.entry_path(key))
+        files = [entry for entry in os.scandir(self.path) if entry.name.endswith(".npy")]
+        if len(files) > MAX_ENTRIES:
+            files.sort(key=lambda entry: entry.stat().st_mtime)
+            for entry in files[:len(files) - MAX_ENTRIES]:
+                os.remove(entry.path)
+
+    def apply(self, snap, order, key):
+        """Move the movable nodes to a cached layout around their current center, False if there is none"""
+        positions = self.lookup(key)
+        if positions is None or len(snap.movable) == 0:
+            return positions is not None
+        movable = np.zeros(len(snap), dtype=bool)
+        movable[snap.movable] = True
+        moved = movable[order]
+        center = snap.pos[snap.movable].mean(axis=0)
+        snap.pos[order[moved]] = positions[moved] + center
+        return True
+
+    def remember(self, snap, order, key):
+        center = snap.pos[snap.movable].mean(axis=0) if len(snap.movable) else np.zeros(2)
+        self.store(key, snap.pos[order] - center)
+
+
+cache = LayoutCache()
@@ -0,0 +1,135 @@
+import numpy as np
+
+from .snapshot import LinkTable
+
+# Coarsening stops once the solved nodes fit in this many coarse nodes
+COARSEST_NODES = 100
+# or when a round of matching no longer removes at least a tenth of them
+MIN_REDUCTION = 0.9
+# Extra matching weight of a link that is the only output of its source and the only input of its target
+CHAIN_WEIGHT = 4
+
+
+def match_pairs(fine, solved):
+    """Disjoint (source, target) pairs of linked solved nodes, heaviest links first"""
+    n = len(fine)
+    links = fine.links
+    src = links.src
+    dst = links.dst
+    use = solved[src] & solved[dst] & links.siblings & (src != dst)
+    keys, weight = np.unique(src[use] * n + dst[use], return_counts=True)
+    a, b = np.divmod(keys, n)
+
+    # Links that continue a linear chain are merged first
+    out_cnt = np.diff(links.out_ptr)
+    in_cnt = np.diff(links.in_ptr)
+    weight = weight + CHAIN_WEIGHT * ((out_cnt[a] == weight) & (in_cnt[b] == weight))
+    # Heaviest first, small merged nodes before large ones on equal weight
+    area = fine.size[a].prod(axis=1) + fine.size[b].prod(axis=1)
+    order = np.lexsort((area, -weight))
+
+    taken = np.zeros(n, dtype=bool)
+    pairs = []
+    for i, j in zip(a[order].tolist(), b[order].tolist()):
+        if not taken[i] and not taken[j]:
+            taken[i] = taken[j] = True
+            pairs.append((i, j))
+    return np.array(pairs, dtype=np.int64).reshape(-1, 2)
+
+
+class CoarseLevel:
+    """Finer tree with matched node pairs merged into one node each.
+
+    A merged node holds the source on the left and the target one distance to
+    the right, with their linked sockets at the same height. Unmatched nodes,
+    frames and nodes that are not solved are carried over as they are.
+    """
+
+    def __init__(self, fine, idx, distance):
+        self.fine = fine
+        self.stats = fine.stats
+        n = len(fine)
+        solved = np.zeros(n, dtype=bool)
+        solved[idx] = True
+        pairs = match_pairs(fine, solved)
+        a, b = pairs.T
+
+        # Fine node -> coarse node, the target of a pair goes with its source
+        keep = np.ones(n, dtype=bool)
+        keep[b] = False
+        self.map = np.cumsum(keep) - 1
+        self.map[b] = self.map[a]
+        coarse_cnt = int(keep.sum())
+
+        # Height of the target relative to the source, averaged over the links between them
+        fine_links = fine.links
+        pair_key = np.full(n, -1, dtype=np.int64)
+        pair_key[a] = np.arange(len(a))
+        inner = (pair_key[fine_links.src] >= 0) & (self.map[fine_links.src] == self.map[fine_links.dst])
+        inner &= fine_links.src != fine_links.dst
+        owner = pair_key[fine_links.src[inner]]
+        src_h = fine.size[fine_links.src[inner], 1]
+        dst_h = fine.size[fine_links.dst[inner], 1]
+        dy = fine_links.dst_slot[inner] * dst_h - fine_links.src_slot[inner] * src_h
+        dy = np.bincount(owner, dy, minlength=len(a)) / np.maximum(np.bincount(owner, minlength=len(a)), 1)
+
+        # Member positions relative to the top left corner of their coarse node
+        size_a = fine.size[a]
+        size_b = fine.size[b]
+        top = np.maximum(dy, 0)
+        bottom = np.minimum(-size_a[:, 1], dy - size_b[:, 1])
+        self.local = np.zeros((n, 2))
+        self.local[a, 1] = -top
+        self.local[b, 0] = size_a[:, 0] + distance
+        self.local[b, 1] = dy - top
+
+        self.size = np.zeros((coarse_cnt, 2))
+        self.size[self.map[keep]] = fine.size[keep]
+        self.size[self.map[a], 0] = size_a[:, 0] + distance + size_b[:, 0]
+        self.size[self.map[a], 1] = top - bottom
+
+        self.pos = np.zeros((coarse_cnt, 2))
+        self.pos[self.map[keep]] = fine.pos[keep] - self.local[keep]
+
+        self.parent = np.full(coarse_cnt, -1, dtype=np.int64)
+        nested = keep & (fine.parent >= 0)
+        self.parent[self.map[nested]] = self.map[fine.parent[nested]]
+        self.is_frame = np.zeros(coarse_cnt, dtype=bool)
+        self.is_frame[self.map[keep]] = fine.is_frame[keep]
+        self.movable = np.flatnonzero(~self.is_frame)
+        self.idx = np.unique(self.map[idx])
+        self.links = self.coarse_links(fine_links)
+
+    def coarse_links(self, fine_links):
+        # Links between different coarse nodes, with the sockets moved to their height in the coarse node
+        fine = self.fine
+        use = self.map[fine_links.src] != self.map[fine_links.dst]
+        src = fine_links.src[use]
+        dst = fine_links.dst[use]
+        src_c = self.map[src]
+        dst_c = self.map[dst]
+        src_slot = (fine_links.src_slot[use] * fine.size[src, 1] - self.local[src, 1]) / self.size[src_c, 1]
+        dst_slot = (fine_links.dst_slot[use] * fine.size[dst, 1] - self.local[dst, 1]) / self.size[dst_c, 1]
+        return LinkTable(len(self), src_c, dst_c, fine_links.src_socket[use], fine_links.dst_socket[use],
+                         src_slot, dst_slot, self.parent[src_c] == self.parent[dst_c])
+
+    def __len__(self):
+        return len(self.size)
+
+    def prolong(self):
+        # Place the finer tree's nodes where their coarse nodes ended up
+        self.fine.pos[:] = self.pos[self.map] + self.local
+
+
+def coarsen(snap, idx, distance):
+    """Coarser and coarser levels of the snapshot, the first one built from the snapshot itself"""
+    levels = []
+    fine = snap
+    while len(idx) > COARSEST_NODES:
+        level = CoarseLevel(fine, idx, distance)
+        if len(level.idx) > len(idx) * MIN_REDUCTION:
+            break
+        levels.append(level)
+        fine = level
+        idx = level.idx
+    return levels
@@ -1,40 +1,38 @@
 import bpy
-import mathutils
-
-from .utils import arrange_relax, global_loc, calc_collision_y, calc_node
-
-
-def step(step_num, iter_num, nodes, props, root_center, iter_func):
-    iter_cnt = 0
-    for i in range(iter_num):
-        new_center = mathutils.Vector((0, 0))
-        node_cnt = 0
-        changed = False
-        for node in nodes:
-            if node.type == 'FRAME':
-                continue
-            if props.ArrangeOnlySelected and not node.select:
-                continue
-            t = i / iter_num
-            if iter_func(node, t):
-                changed = True
-            new_center += global_loc(node)
-            node_cnt += 1
-
-        if not changed and props.AdaptiveIters:
-            break
-        if not props.ArrangeOnlySelected:
-            new_center /= node_cnt
-            slide = root_center - new_center  # Keep Center
-            for node in nodes:
-                if node.type == 'FRAME':
-                    continue
-                node.location += slide
-        iter_cnt += 1
-        if iter_cnt > props.BackgroundIterations:
-            iter_cnt = 0
-            props.ArrangeState = str(i) + "/" + str(iter_num) + " " + str(step_num) + "/4"
-            yield 1
+
+from . import layout_cache
+from .batch import Settings
+from .incremental import ArrangedState, arranged_states, changed_region
+from .resume import StoppedRun, settings_key, stopped_runs, warm_start
+from .snapshot import TreeSnapshot
+from .scheduler import TickScheduler
+from .solver import Checkpoint, arrange
+from .worker import SolverThread
+from . import stats
+
+# Events that only move the view, they reach the editors while the solver runs in the background
+NAVIGATION_EVENTS = {'MOUSEMOVE', 'INBETWEEN_MOUSEMOVE', 'MIDDLEMOUSE', 'WHEELUPMOUSE', 'WHEELDOWNMOUSE',
+                     'TRACKPADPAN', 'TRACKPADZOOM', 'NDOF_MOTION'}
+# Editors that cannot add or remove nodes of the solved tree, all their events reach them meanwhile.
+# Node editors only if they show another tree
+SAFE_AREAS = {'VIEW_3D', 'IMAGE_EDITOR', 'SPREADSHEET', 'NODE_EDITOR'}
+# Arranges in progress, they stop writing once undo, redo or loading a file replaces their tree
+running = set()
+
+
+def abandon_running(*args):
+    for op in list(running):
+        op.abandon()
+
+
+UNDO_HANDLERS = (bpy.app.handlers.undo_pre, bpy.app.handlers.redo_pre, bpy.app.handlers.load_pre)
+
+
+def area_under(screen, x, y):
+    for area in screen.areas:
+        if area.x <= x < area.x + area.width and area.y <= y < area.y + area.height:
+            return area
+    return None
 
 
 class NodeRelaxArrange(bpy.types.Operator):
@@ -55,45 +53,140 @@ class NodeRelaxArrange(bpy.types.Operator):
 
     def main_routine(self, context):
         yield 1
-        nodes = self.tree.nodes
         props = context.scene.NodeRelax_props
-        root_center = mathutils.Vector((0, 0))  # Original Center
-
-        if not props.ArrangeOnlySelected:
-            node_cnt = 0
-            for node in nodes:
-                if node.type == 'FRAME':
-                    continue
-                root_center += global_loc(node)
-                node_cnt += 1
-            root_center /= node_cnt
-
-        yield from step(1, props.Iterations_S1, nodes, props, root_center,
-                        lambda curr_node, e: arrange_relax(curr_node, 1, 1, props.Distance, False))
-
-        yield from step(2, props.Iterations_S2, nodes, props, root_center,
-                        lambda curr_node, e: arrange_relax(curr_node, 1, 1, props.Distance, True))
-
-        dist = mathutils.Vector((0, props.Distance))
-        yield from step(3, props.Iterations_S3, nodes, props, root_center,
-                        lambda curr_node, e: calc_collision_y(curr_node, nodes, e, dist))
+        self.snapshot = TreeSnapshot(self.tree)
+        stats.last["arrange"] = self.snapshot.stats
+
+        pointer = self.tree.as_pointer()
+        idx = None
+        solved = self.snapshot.solve_indices(props.ArrangeOnlySelected)
+        state = arranged_states.get(pointer)
+        stopped = stopped_runs.pop(pointer, None)
+        if stopped is not None and stopped.matches(self.snapshot, props, solved):
+            # Continue the cancelled run where it stopped
+            idx = stopped.idx
+            self.checkpoint = stopped.checkpoint
+        else:
+            if props.Incremental and state is not None:
+                idx = changed_region(self.snapshot, state, solved)
+            if props.WarmStart and state is not None:
+                self.checkpoint = warm_start(self.snapshot, state, props)
+        if self.checkpoint is None:
+            self.checkpoint = Checkpoint()
+        self.solved = solved
+        self.idx = idx
+        if self.checkpoint.stage > 4:
+            yield 0
+            return
+
+        # Only layouts of whole trees are cached, they do not depend on where other nodes are
+        key = None
+        if props.UseLayoutCache and idx is None and not props.ArrangeOnlySelected:
+            layout_cache.cache.use_dir(bpy.path.abspath(props.LayoutCacheDir))
+            order = layout_cache.canonical_order(self.snapshot)
+            key = layout_cache.layout_key(self.snapshot, order, props)
+            if layout_cache.cache.apply(self.snapshot, order, key):
+                arranged_states[pointer] = ArrangedState(self.snapshot, settings_key(props))
+                yield 0
+                return
+
+        if props.BackgroundSolve:
+            yield from self.solve_in_background(props, idx)
+        else:
+            yield from self.solve_in_ticks(props, idx)
+
+        # Only a finished arrange is a base for the next incremental one
+        self.checkpoint = None
+        arranged_states[pointer] = ArrangedState(self.snapshot, settings_key(props))
+        if key is not None:
+            layout_cache.cache.remember(self.snapshot, order, key)
+        yield 0
 
-        dist = mathutils.Vector((props.Distance, props.Distance))
-        zero_vec = mathutils.Vector((0, 0))
-        yield from step(4, props.Iterations_S4, nodes, props, root_center,
-                        lambda curr_node, e: calc_node(curr_node, nodes, min(1, e * 2), zero_vec, 0.2, 1, dist, True))
+    def solve_in_ticks(self, props, idx):
+        stage_iterations = (props.Iterations_S1, props.Iterations_S2, props.Iterations_S3, props.Iterations_S4)
+        scheduler = TickScheduler(arrange(self.snapshot, props, idx, self.checkpoint), stage_iterations)
+        write_seconds = 0
+        while True:
+            # Leave room in the tick for writing the preview
+            scheduler.tick(max(props.TickBudget / 1000 - write_seconds, 0))
+            if scheduler.done:
+                break
+            write_start = self.snapshot.stats.write_seconds
+            self.snapshot.write_back()  # Preview
+            write_seconds = self.snapshot.stats.write_seconds - write_start
+            step_num, i, iter_num = scheduler.progress
+            props.ArrangeState = "%d/%d %d/4  ETA %ds" % (i, iter_num, step_num, round(scheduler.eta()))
+            yield 1
 
-        yield 0
+    def solve_in_background(self, props, idx):
+        self.worker = SolverThread(self.snapshot, Settings.from_props(props), idx, self.checkpoint)
+        self.worker.start()
+        while self.worker.is_alive():
+            yield 1
+            progress = self.apply_latest()
+            if progress is not None:
+                step_num, i, iter_num = progress
+                props.ArrangeState = "%d/%d %d/4" % (i, iter_num, step_num)
+        self.worker.join()
+        self.apply_latest()
+        if self.worker.error is not None:
+            raise self.worker.error
+
+    def apply_latest(self):
+        # Write the positions the worker published since the last call, returns their progress
+        version, pos, offset, progress = self.worker.latest()
+        if version == self.applied_version:
+            return None
+        self.applied_version = version
+        self.snapshot.pos[:] = pos
+        self.snapshot.offset[:] = offset
+        self.snapshot.write_back()
+        return progress
+
+    def abandon(self):
+        # The nodes of the snapshot are about to be freed, stop without writing to them again
+        if self.worker is not None and self.worker.is_alive():
+            self.worker.cancel()
+        self.snapshot = None
+        self.checkpoint = None
+        self.abandoned = True
 
     def finish(self, context):
         wm = context.window_manager
         wm.event_timer_remove(self._timer)
+        running.discard(self)
+        if not running:
+            for handlers in UNDO_HANDLERS:
+                if abandon_running in handlers:
+                    handlers.remove(abandon_running)
         props = context.scene.NodeRelax_props
+        if self.worker is not None and self.worker.is_alive():
+            # Cancelled, keep what the worker got to
+            self.worker.cancel()
+            self.snapshot.pos[:] = self.worker.snap.pos
+            self.snapshot.offset[:] = self.worker.snap.offset
+        if self.snapshot is not None:
+            self.snapshot.write_back()
+        if self.checkpoint is not None and self.checkpoint.started:
+            # Cancelled, the next arrange of the unchanged tree continues from here
+            stopped_runs[self.tree.as_pointer()] = StoppedRun(self.snapshot, props, self.solved, self.idx,
+                                                              self.checkpoint)
         props.ArrangeState = ""
 
     def modal(self, context, event):
+        if self.abandoned:
+            self.finish(context)
+            return {'CANCELLED'}
+
         if event.type == 'TIMER':
-            state = next(self.main_coroutine)
+            try:
+                state = next(self.main_coroutine)
+            except Exception as error:
+                # Nothing more is written and the failed run is not continued later
+                self.abandon()
+                self.finish(context)
+                self.report({'ERROR'}, "Arrange failed: %s" % error)
+                return {'CANCELLED'}
             if state == 0:
                 self.finish(context)
                 return {'FINISHED'}
@@ -102,11 +195,39 @@ class NodeRelaxArrange(bpy.types.Operator):
             self.finish(context)
             return {'FINISHED'}
 
+        if self.worker is not None and self.passes_through(context, event):
+            return {'PASS_THROUGH'}
         return {'RUNNING_MODAL'}
 
+    def passes_through(self, context, event):
+        # The solver runs on its own, navigation and editors that cannot change the tree stay usable meanwhile.
+        # Its nodes are written again on the next preview, so nothing may remove them
+        if event.type in NAVIGATION_EVENTS:
+            return True
+        if event.type in {'Z', 'Y'} and (event.ctrl or event.oskey):
+            return False  # Undo is global, the abandon handler would have to stop the arrange
+        area = area_under(context.window.screen, event.mouse_x, event.mouse_y)
+        if area is None or area.type not in SAFE_AREAS:
+            return False
+        return area.type != 'NODE_EDITOR' or area.spaces.active.edit_tree != self.tree
+
+    def cancel(self, context):
+        # Blender ends the operator itself, e.g. when a file is loaded
+        self.abandon()
+        self.finish(context)
+
     def invoke(self, context, event):
         self.tree = context.space_data.edit_tree
-
+        self.snapshot = None
+        self.checkpoint = None
+        self.worker = None
+        self.applied_version = 0
+        self.abandoned = False
+
+        running.add(self)
+        for handlers in UNDO_HANDLERS:
+            if abandon_running not in handlers:
+                handlers.append(abandon_running)
         wm = context.window_manager
         self.main_coroutine = self.main_routine(context)
         self._timer = wm.event_timer_add(0.01, window=context.window)
@@ -1,23 +1,33 @@
+import time
+
+import blf
 import bpy
 import mathutils
+import mathutils.kdtree
+import numpy as np
 
-from .utils import global_loc, calc_node
+from .snapshot import TreeSnapshot
+from .spatial import NodeGrid
+from .stroke import StrokeRecorder, brush_pass
+from . import stats
 import gpu
 from gpu_extras.presets import draw_circle_2d
 from gpu_extras.batch import batch_for_shader
 
 DRAW_COLOR = (1, 1, 1, 0.5)
 DRAW_RADIUS = 10
+# Part of the tick interval that has to pass before the next tick, below 1 so late timer events are not skipped
+TICK_SLACK = 0.8
 
 
 def draw_callback(self):
     if self.drag_mode:
-        if self.dragging_node:
-            node = self.dragging_node
-            loc = global_loc(node)
+        if self.dragging_node is not None:
+            loc = self.snapshot.pos[self.dragging_node]
+            size = self.snapshot.size[self.dragging_node]
 
             x1, y1 = loc[0] - DRAW_RADIUS, loc[1] + DRAW_RADIUS
-            x2, y2 = loc[0] + node.dimensions[0] + DRAW_RADIUS, loc[1] - node.dimensions[1] - DRAW_RADIUS
+            x2, y2 = loc[0] + size[0] + DRAW_RADIUS, loc[1] - size[1] - DRAW_RADIUS
 
             shader = gpu.shader.from_builtin('2D_SMOOTH_COLOR')
 
@@ -32,6 +42,25 @@ def draw_callback(self):
         draw_circle_2d(self.cursor_pos, DRAW_COLOR, self.radius)
 
 
+def draw_stats_callback(self):
+    if not bpy.context.scene.NodeRelax_props.ShowStats:
+        return
+    solver_stats = self.snapshot.stats
+    stage = solver_stats.stage
+    lines = (
+        "Tick: %.2f ms  (%d ticks, %.2f ms total)" % (
+            solver_stats.last_seconds * 1000, stage["iterations"], stage["seconds"] * 1000),
+        "Moved: %d  Pairs: %d" % (
+            stage["moved_nodes"][-1] if stage["moved_nodes"] else 0,
+            stage["collision_pairs"][-1] if stage["collision_pairs"] else 0),
+        "Write: %.2f ms total (%d nodes)" % (solver_stats.write_seconds * 1000, solver_stats.written_nodes),
+    )
+    blf.color(0, *DRAW_COLOR)
+    for i, line in enumerate(reversed(lines)):
+        blf.position(0, 20, 20 + i * 18, 0)
+        blf.draw(0, line)
+
+
 class NodeRelaxBrush(bpy.types.Operator):
     """Relax Nodes"""
     bl_idname = "node_relax.brush"
@@ -42,9 +71,8 @@ class NodeRelaxBrush(bpy.types.Operator):
     def __init__(self):
         self.radius = 100
         self.lmb = False
-        self.delta = mathutils.Vector((0, 0))
         self.cursor_pos = mathutils.Vector((0, 0))
-        self.cursor_prev_pos = mathutils.Vector((0, 0))
+        self.cursor_tick_pos = mathutils.Vector((0, 0))  # Cursor position at the last tick
         self.slide_vec = mathutils.Vector((0, 0))
         self. drag_mode = False
         self.is_dragging = False
@@ -56,7 +84,6 @@ class NodeRelaxBrush(bpy.types.Operator):
         return space.type == 'NODE_EDITOR' and space.node_tree is not None
 
     def update_cursor_pos(self, context, event):
-        self.cursor_prev_pos = self.cursor_pos
         self.cursor_pos = mathutils.Vector(
             context.region.view2d.region_to_view(event.mouse_region_x, event.mouse_region_y))
 
@@ -65,64 +92,67 @@ class NodeRelaxBrush(bpy.types.Operator):
         radius0 = context.region.view2d.region_to_view(0, 0)
         self.radius = radiusM[0] - radius0[0]
 
-    def get_brush_influence(self, loc, size):
-        self.delta.x = self.cursor_pos.x - min(max(self.cursor_pos.x, loc.x), loc.x + size.x)
-        self.delta.y = self.cursor_pos.y - max(min(self.cursor_pos.y, loc.y), loc.y - size.y)
-
-        dist_sqr = self.delta.x * self.delta.x + self.delta.y * self.delta.y
-
-        return 1 - (dist_sqr / (self.radius * self.radius))
-
     def main_operation(self, context):
-        nodes = self.tree.nodes
+        start = time.perf_counter()
+        self.brush_operation(context)
+        self.snapshot.stats.end_iteration(time.perf_counter() - start)
+        if self.recorder is not None:
+            pressed = self.is_dragging if self.drag_mode else self.lmb
+            self.recorder.record(self.cursor_pos, self.slide_vec, self.radius, pressed, self.drag_mode,
+                                 self.dragging_node, context.scene.NodeRelax_props)
+
+    def brush_operation(self, context):
+        snap = self.snapshot
         props = context.scene.NodeRelax_props
 
-        self.slide_vec = self.cursor_pos - self.cursor_prev_pos
-        context.area.tag_redraw()
+        # All mouse movement since the last tick
+        self.slide_vec = self.cursor_pos - self.cursor_tick_pos
+        self.cursor_tick_pos = self.cursor_pos.copy()
 
         if self.drag_mode:
             if self.is_dragging:
-                if self.dragging_node:
-                    self.dragging_node.location += self.slide_vec
+                if self.dragging_node is not None:
+                    snap.pos[self.dragging_node] += np.array(self.slide_vec)
+                    self.nodes_moved([self.dragging_node])
             else:
-                self.update_dragging_node(nodes)
+                self.update_dragging_node()
         else:
             if self.lmb:
-                dist = mathutils.Vector((props.Distance, props.Distance))
-                for node in nodes:
-                    if node.type == 'FRAME':
-                        continue
-                    # Brush
-                    loc = global_loc(node)
-                    size = node.dimensions
-                    infl = self.get_brush_influence(loc, size)
-                    if infl <= 0:
-                        continue
-
-                    # Calculate physics
-                    calc_node(node, nodes, infl, self.slide_vec * props.SlidePower, props.RelaxPower,
-                              props.CollisionPower, dist, False)
-
-    def update_dragging_node(self, nodes):
+                idx = brush_pass(snap, self.node_grid, np.array(self.cursor_pos), self.radius,
+                                 np.array(self.slide_vec), props.RelaxPower, props.SlidePower,
+                                 props.CollisionPower, props.Distance)
+                if idx is not None:
+                    self.nodes_moved(idx)
+
+    def nodes_moved(self, idx):
+        self.snapshot.write_back()
+        self.node_grid.update(idx)
+        self.pick_tree = None
+
+    def update_dragging_node(self):
         self.dragging_node = None
-        nearest = 0
-        for node in nodes:
-            if node.type == 'FRAME':
-                continue
-            loc = global_loc(node)
-            pos = mathutils.Vector((loc.x, loc.y))
-            pos.x += node.dimensions.x / 2
-            pos.y -= node.dimensions.y / 2
-            pos -= self.cursor_pos
-            dist = pos.x * pos.x + pos.y * pos.y  # Squared length
-            if self.dragging_node is None or dist < nearest:
-                self.dragging_node = node
-                nearest = dist
+        snap = self.snapshot
+        if len(snap.movable) == 0:
+            return
+        if self.pick_tree is None:
+            # Nearest node center, rebuilt after nodes were moved
+            centers = snap.pos[snap.movable] + snap.size[snap.movable] * (0.5, -0.5)
+            self.pick_tree = mathutils.kdtree.KDTree(len(centers))
+            for i, (x, y) in zip(snap.movable.tolist(), centers.tolist()):
+                self.pick_tree.insert((x, y, 0), i)
+            self.pick_tree.balance()
+        co, index, dist = self.pick_tree.find((self.cursor_pos.x, self.cursor_pos.y, 0))
+        self.dragging_node = index
 
     def finish(self, context, props):
         st = bpy.types.SpaceNodeEditor
         st.draw_handler_remove(self.draw_handler, 'WINDOW')
+        st.draw_handler_remove(self.stats_handler, 'WINDOW')
+        context.window_manager.event_timer_remove(self.timer)
         props.IsRunning = False
+        stats.last["brush"] = self.snapshot.stats
+        if self.recorder is not None and self.recorder.events:
+            self.recorder.save(bpy.path.abspath(props.BrushStrokeFile))
 
     def modal(self, context, event):
         props = context.scene.NodeRelax_props
@@ -136,13 +166,26 @@ class NodeRelaxBrush(bpy.types.Operator):
             if event.value == 'RELEASE':
                 self.drag_mode = False
             self.is_dragging = False
-            self.update_dragging_node(self.tree.nodes)
+            self.update_dragging_node()
             context.area.tag_redraw()
 
+        now = time.perf_counter()
+        if event.type == 'TIMER' and now - self.last_tick >= TICK_SLACK / props.BrushRate:
+            # Fixed rate simulation, the brush keeps relaxing while the mouse stands still.
+            # Timers of other operators send TIMER events too, those come too early and are skipped
+            self.last_tick = now
+            cursor_moved = self.cursor_pos != self.cursor_tick_pos
+            if self.lmb or self.drag_mode:
+                self.main_operation(context)
+            else:
+                self.cursor_tick_pos = self.cursor_pos.copy()
+            if cursor_moved or self.lmb:
+                context.area.tag_redraw()
+
         if event.type == 'MOUSEMOVE':
+            # Only collected here, the next tick applies it
             self.update_cursor_pos(context, event)
             self.update_radius(context, props.BrushSize)
-            self.main_operation(context)
 
         if event.type == 'WHEELUPMOUSE' or event.type == 'WHEELDOWNMOUSE':
             self.update_cursor_pos(context, event)
@@ -156,8 +199,7 @@ class NodeRelaxBrush(bpy.types.Operator):
                     self.is_dragging = True
                 else:
                     self.update_cursor_pos(context, event)
-                    self.cursor_prev_pos = self.cursor_pos  # No sliding
-                    self.main_operation(context)
+                    self.cursor_tick_pos = self.cursor_pos.copy()  # No sliding
             if event.value == 'RELEASE':
                 self.lmb = False
                 if self.drag_mode:
@@ -188,13 +230,22 @@ class NodeRelaxBrush(bpy.types.Operator):
             return {'CANCELLED'}
 
         self.tree = context.space_data.edit_tree
+        self.snapshot = TreeSnapshot(self.tree)
+        self.snapshot.stats.begin_stage("Brush", 0)
+        self.node_grid = NodeGrid(self.snapshot, self.snapshot.movable)
+        self.pick_tree = None
+        self.recorder = StrokeRecorder(self.snapshot) if props.RecordBrush and props.BrushStrokeFile else None
+        self.timer = context.window_manager.event_timer_add(1 / props.BrushRate, window=context.window)
+        self.last_tick = 0
         context.window_manager.modal_handler_add(self)
         st = bpy.types.SpaceNodeEditor
         self.draw_handler = st.draw_handler_add(draw_callback, (self,), 'WINDOW', 'POST_VIEW')
+        self.stats_handler = st.draw_handler_add(draw_stats_callback, (self,), 'WINDOW', 'POST_PIXEL')
 
         self.lmb = False
         props.IsRunning = True
         self.update_cursor_pos(context, event)
+        self.cursor_tick_pos = self.cursor_pos.copy()
         self.update_radius(context, props.BrushSize)
 
         context.area.tag_redraw()
@@ -0,0 +1,24 @@
+import json
+
+import bpy
+from bpy_extras.io_utils import ExportHelper
+
+from . import stats
+
+
+class NodeRelaxExportStats(bpy.types.Operator, ExportHelper):
+    """Save timings and counters of the last arrange and brush runs as JSON"""
+    bl_idname = "node_relax.export_stats"
+    bl_label = "Export Stats"
+
+    filename_ext = ".json"
+
+    @classmethod
+    def poll(cls, context):
+        return len(stats.last) > 0
+
+    def execute(self, context):
+        report = {kind: solver_stats.report() for kind, solver_stats in stats.last.items()}
+        with open(self.filepath, "w") as f:
+            json.dump(report, f, indent=2)
+        return {'FINISHED'}
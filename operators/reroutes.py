@@ -0,0 +1,75 @@
+import numpy as np
+
+from .components import SubTree
+from .snapshot import LinkTable
+
+
+def reroute_chains(snap):
+    """(first link, reroutes, last link) of every chain of reroutes that passes a single link on.
+
+    A reroute with more than one outgoing link splits the chain and stays a node.
+    """
+    links = snap.links
+    through = snap.is_reroute & (np.diff(links.in_ptr) == 1) & (np.diff(links.out_ptr) == 1)
+    chains = []
+    for first in np.flatnonzero(~through[links.src] & through[links.dst]).tolist():
+        reroutes = []
+        link = first
+        while through[links.dst[link]]:
+            node = links.dst[link]
+            reroutes.append(node)
+            link = links.out_order[links.out_ptr[node]]
+        chains.append((first, np.array(reroutes, dtype=np.int64), link))
+    return chains
+
+
+class CollapsedTree(SubTree):
+    """The tree without its reroute chains, every chain replaced by one link between the nodes at its ends"""
+
+    def __init__(self, snap, chains):
+        inside = np.zeros(len(snap), dtype=bool)
+        for _, reroutes, _ in chains:
+            inside[reroutes] = True
+        super().__init__(snap, snap.movable[~inside[snap.movable]])
+        self.chains = chains
+
+        index = np.full(len(snap), -1, dtype=np.int64)
+        index[self.members] = np.arange(len(self.members))
+        links = snap.links
+        first = np.array([chain[0] for chain in chains], dtype=np.int64)
+        last = np.array([chain[2] for chain in chains], dtype=np.int64)
+        src = links.src[first]
+        dst = links.dst[last]
+        own = self.links
+        self.links = LinkTable(
+            len(self.members),
+            np.concatenate((own.src, index[src])), np.concatenate((own.dst, index[dst])),
+            np.concatenate((own.src_socket, links.src_socket[first])),
+            np.concatenate((own.dst_socket, links.dst_socket[last])),
+            np.concatenate((own.src_slot, links.src_slot[first])),
+            np.concatenate((own.dst_slot, links.dst_slot[last])),
+            np.concatenate((own.siblings, snap.parent[src] == snap.parent[dst])))
+
+        # Every reroute with the link ends of its chain and how far along the chain it sits
+        count = np.array([len(reroutes) for _, reroutes, _ in chains], dtype=np.int64)
+        self.reroutes = np.concatenate([reroutes for _, reroutes, _ in chains])
+        self.first = np.repeat(first, count)
+        self.last = np.repeat(last, count)
+        step = np.concatenate([np.arange(1, n + 1) for n in count.tolist()])
+        self.along = (step / np.repeat(count + 1, count))[:, None]
+
+    def commit(self, shift):
+        super().commit(shift)
+        self.place_reroutes()
+
+    def place_reroutes(self):
+        # Reroutes are spread evenly along the straight line between the sockets their chain connects
+        snap = self.snap
+        links = snap.links
+        pos = snap.pos
+        size = snap.size
+        src = links.src[self.first]
+        dst = links.dst[self.last]
+        start = np.stack((pos[src, 0] + size[src, 0], pos[src, 1] - links.src_slot[self.first] * size[src, 1]), axis=1)
+        end = np.stack((pos[dst, 0], pos[dst, 1] - links.dst_slot[self.last] * size[dst, 1]), axis=1)
+        pos[self.reroutes] = start + (end - start) * self.along - size[self.reroutes] * (0.5, -0.5)
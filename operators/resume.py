@@ -0,0 +1,45 @@
+"""Arrange runs kept per node tree, to continue a cancelled one or start from the last finished one"""
+import numpy as np
+
+from .incremental import ArrangedState
+from .layout_cache import KEY_PROPS
+from .solver import Checkpoint
+
+# Tree pointer -> StoppedRun of the last cancelled arrange
+stopped_runs = {}
+
+
+def settings_key(props):
+    return tuple(getattr(props, name) for name in KEY_PROPS + ("ArrangeOnlySelected", "Incremental"))
+
+
+class StoppedRun:
+    """A cancelled arrange: where the solver was, what it solved and the tree as it was left"""
+
+    def __init__(self, snap, props, solved, idx, checkpoint):
+        checkpoint.freeze()
+        self.state = ArrangedState(snap, settings_key(props))
+        self.solved = solved
+        self.idx = idx
+        self.checkpoint = checkpoint
+
+    def matches(self, snap, props, solved):
+        # Nothing was edited, moved or selected since, and the settings are the same
+        if self.state.settings != settings_key(props) or not np.array_equal(self.solved, solved):
+            return False
+        return not self.state.changed_nodes(snap).any()
+
+
+def warm_start(snap, state, props):
+    """Checkpoint that skips the stages the last finished arrange does not need to redo.
+
+    Stages 1 and 2 only depend on node sizes and links, if neither changed the
+    layout they left is kept and only the overlaps are solved again. Returns None if
+    all stages have to run, a checkpoint past stage 4 if nothing changed at all.
+    """
+    if state.settings != settings_key(props):
+        return None
+    moved, resized, relinked = state.changes(snap)
+    if resized.any() or relinked.any():
+        return None
+    return Checkpoint(3 if moved.any() else 5)
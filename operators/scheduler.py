@@ -0,0 +1,43 @@
+import time
+
+SMOOTHING = 0.3
+
+
+class TickScheduler:
+    """Runs solver iterations until the time budget of a timer tick is used up"""
+
+    def __init__(self, iterations, stage_iterations):
+        self.iterations = iterations  # Generator yielding (stage, iteration, iterations)
+        self.stage_iterations = stage_iterations  # Maximum iterations of every stage
+        self.cost = {}  # Stage -> smoothed seconds per iteration
+        self.progress = None
+        self.done = False
+
+    def tick(self, budget):
+        start = time.perf_counter()
+        last = start
+        while not self.done:
+            try:
+                self.progress = next(self.iterations)
+            except StopIteration:
+                self.done = True
+                break
+            now = time.perf_counter()
+            stage = self.progress[0]
+            cost = self.cost.get(stage)
+            self.cost[stage] = now - last if cost is None else cost + (now - last - cost) * SMOOTHING
+            last = now
+            # Stop if the next iteration would likely not fit
+            if now - start + self.cost[stage] > budget:
+                break
+
+    def eta(self):
+        # Upper bound, adaptive iterations can end stages early
+        if self.progress is None:
+            return None
+        stage, i, iter_num = self.progress
+        cost = self.cost[stage]
+        remaining = (iter_num - i - 1) * cost
+        for later in range(stage + 1, len(self.stage_iterations) + 1):
+            remaining += self.stage_iterations[later - 1] * self.cost.get(later, cost)
+        return remaining
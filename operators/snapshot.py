@@ -0,0 +1,228 @@
+import time
+
+import numpy as np
+
+from .stats import SolverStats
+
+
+def concat_ranges(start, count):
+    # Indices start[0]..start[0]+count[0]-1, start[1].., as one flat array
+    return np.repeat(start - np.cumsum(count) + count, count) + np.arange(count.sum())
+
+
+def csr(owner, node_cnt):
+    # Links sorted by owning node, with the range of node i at order[ptr[i]:ptr[i + 1]]
+    order = np.argsort(owner, kind='stable')
+    ptr = np.zeros(node_cnt + 1, dtype=np.int64)
+    np.cumsum(np.bincount(owner, minlength=node_cnt), out=ptr[1:])
+    return order, ptr
+
+
+class LinkTable:
+    """Links of a node tree as flat arrays, with the input and output links of every node"""
+
+    def __init__(self, node_cnt, src, dst, src_socket, dst_socket, src_slot, dst_slot, siblings):
+        self.src = src
+        self.dst = dst
+        # Socket index in node.outputs and node.inputs
+        self.src_socket = src_socket
+        self.dst_socket = dst_socket
+        # Normalized vertical position of the socket among the linked sockets of its node
+        self.src_slot = src_slot
+        self.dst_slot = dst_slot
+        # Both nodes are in the same frame (or in none)
+        self.siblings = siblings
+
+        self.in_order, self.in_ptr = csr(dst, node_cnt)
+        self.out_order, self.out_ptr = csr(src, node_cnt)
+
+    def __len__(self):
+        return len(self.src)
+
+    def upstream(self, i):
+        return self.src[self.in_order[self.in_ptr[i]:self.in_ptr[i + 1]]]
+
+    def downstream(self, i):
+        return self.dst[self.out_order[self.out_ptr[i]:self.out_ptr[i + 1]]]
+
+    def neighbours(self, idx):
+        # Upstream and downstream nodes of all nodes in idx, with repeats
+        start = self.in_ptr[idx]
+        upstream = self.src[self.in_order[concat_ranges(start, self.in_ptr[idx + 1] - start)]]
+        start = self.out_ptr[idx]
+        downstream = self.dst[self.out_order[concat_ranges(start, self.out_ptr[idx + 1] - start)]]
+        return np.concatenate((upstream, downstream))
+
+
+class SlotTable:
+    """Index and slot of the linked sockets of every node, kept until the node's linked sockets change"""
+
+    def __init__(self):
+        # (node pointer, is output) -> (linked socket pointers, {socket pointer: (index, slot)})
+        self.entries = {}
+
+    def slots(self, node, is_output, linked):
+        key = (node.as_pointer(), is_output)
+        cached = self.entries.get(key)
+        if cached is None or cached[0] != linked:
+            sockets = node.outputs if is_output else node.inputs
+            found = [(i, p) for i, p in enumerate(s.as_pointer() for s in sockets) if p in linked]
+            cached = (linked, {p: (i, k / len(found)) for k, (i, p) in enumerate(found)})
+            self.entries[key] = cached
+        return cached[1]
+
+    def prune(self, nodes):
+        alive = {node.as_pointer() for node in nodes}
+        self.entries = {key: entry for key, entry in self.entries.items() if key[0] in alive}
+
+
+def build_link_table(nodes, links, parent, index, slot_table):
+    src = []
+    dst = []
+    src_socket = []
+    dst_socket = []
+    for link in links:
+        src.append(index[link.from_node])
+        dst.append(index[link.to_node])
+        src_socket.append(link.from_socket.as_pointer())
+        dst_socket.append(link.to_socket.as_pointer())
+
+    linked_out = {}
+    linked_in = {}
+    for a, b, from_socket, to_socket in zip(src, dst, src_socket, dst_socket):
+        linked_out.setdefault(a, set()).add(from_socket)
+        linked_in.setdefault(b, set()).add(to_socket)
+    out_slots = {a: slot_table.slots(nodes[a], True, frozenset(linked)) for a, linked in linked_out.items()}
+    in_slots = {b: slot_table.slots(nodes[b], False, frozenset(linked)) for b, linked in linked_in.items()}
+    slot_table.prune(nodes)
+
+    src_slot = np.array([out_slots[a].get(p, (-1, 0.5)) for a, p in zip(src, src_socket)]).reshape(-1, 2)
+    dst_slot = np.array([in_slots[b].get(p, (-1, 0.5)) for b, p in zip(dst, dst_socket)]).reshape(-1, 2)
+    src = np.array(src, dtype=np.int64)
+    dst = np.array(dst, dtype=np.int64)
+    return LinkTable(len(nodes), src, dst, src_slot[:, 0].astype(np.int64), dst_slot[:, 0].astype(np.int64),
+                     src_slot[:, 1], dst_slot[:, 1], parent[src] == parent[dst])
+
+
+# Tree pointer -> (fingerprint, LinkTable) of the last build
+link_tables = {}
+# Tree pointer -> SlotTable
+slot_tables = {}
+
+
+def link_fingerprint(nodes, links, parent):
+    sockets = tuple((link.from_socket.as_pointer(), link.to_socket.as_pointer()) for link in links)
+    return hash((tuple(node.as_pointer() for node in nodes), parent.tobytes(), sockets))
+
+
+def get_link_table(tree, nodes, parent, index):
+    """Link table of the tree, rebuilt only when its nodes, frames or links changed since the last call"""
+    fingerprint = link_fingerprint(nodes, tree.links, parent)
+    cached = link_tables.get(tree.as_pointer())
+    if cached is not None and cached[0] == fingerprint:
+        return cached[1]
+
+    slot_table = slot_tables.setdefault(tree.as_pointer(), SlotTable())
+    table = build_link_table(nodes, tree.links, parent, index, slot_table)
+    link_tables[tree.as_pointer()] = (fingerprint, table)
+    return table
+
+
+def frame_depth(parent):
+    depth = np.zeros(len(parent), dtype=np.int64)
+    done = parent < 0
+    while not done.all():
+        ready = ~done & done[parent]
+        if not ready.any():
+            break
+        depth[ready] = depth[parent[ready]] + 1
+        done |= ready
+    return depth
+
+
+class TreeSnapshot:
+    """Array copy of a node tree. The solver works on it, nodes are only touched by write_back"""
+
+    def __init__(self, tree):
+        start = time.perf_counter()
+        self.stats = SolverStats()
+        self.nodes = list(tree.nodes)
+        n = len(self.nodes)
+        index = {node: i for i, node in enumerate(self.nodes)}
+
+        loc = np.zeros((n, 2))
+        self.size = np.zeros((n, 2))
+        self.parent = np.full(n, -1, dtype=np.int64)
+        self.is_frame = np.zeros(n, dtype=bool)
+        self.is_reroute = np.zeros(n, dtype=bool)
+        self.select = np.zeros(n, dtype=bool)
+        for i, node in enumerate(self.nodes):
+            loc[i] = node.location
+            self.size[i] = node.dimensions
+            self.is_frame[i] = node.type == 'FRAME'
+            self.is_reroute[i] = node.type == 'REROUTE'
+            self.select[i] = node.select
+            if node.parent:
+                self.parent[i] = index[node.parent]
+
+        self.links = get_link_table(tree, self.nodes, self.parent, index)
+
+        # Frame hierarchy: depth 0 for top level nodes, children grouped per frame
+        self.depth = frame_depth(self.parent)
+        nested = np.flatnonzero(self.parent >= 0)
+        order, self.child_ptr = csr(self.parent[nested], n)
+        self.children = nested[order]
+
+        # Positions are kept in world space, offset is the world location of the parent frame.
+        # Filled level by level, so every frame is placed before its children
+        self.pos = loc.copy()
+        self.offset = np.zeros((n, 2))
+        for level in range(1, self.depth.max(initial=0) + 1):
+            nodes = np.flatnonzero(self.depth == level)
+            self.offset[nodes] = self.pos[self.parent[nodes]]
+            self.pos[nodes] += self.offset[nodes]
+        self.written = loc
+
+        self.movable = np.flatnonzero(~self.is_frame)
+        self.stats.snapshot_seconds = time.perf_counter() - start
+
+    def __len__(self):
+        return len(self.pos)
+
+    def __getstate__(self):
+        # Nodes stay in Blender, a pickled snapshot can be solved in another process but not written back
+        state = self.__dict__.copy()
+        state["nodes"] = None
+        return state
+
+    def solve_indices(self, only_selected):
+        if only_selected:
+            return np.flatnonzero(~self.is_frame & self.select)
+        return self.movable
+
+    def descendants(self, frame):
+        found = []
+        level = np.array([frame])
+        while len(level):
+            start = self.child_ptr[level]
+            level = self.children[concat_ranges(start, self.child_ptr[level + 1] - start)]
+            found.append(level)
+        return np.concatenate(found)
+
+    def move_frame(self, frame, delta):
+        # Children keep their location relative to the frame, so the whole subtree moves along
+        nodes = self.descendants(frame)
+        self.pos[frame] += delta
+        self.pos[nodes] += delta
+        self.offset[nodes] += delta
+
+    def write_back(self):
+        start = time.perf_counter()
+        loc = self.pos - self.offset
+        # Moving a frame shifts both position and offset, compare with a tolerance for the rounding
+        changed = np.flatnonzero((np.abs(loc - self.written) > 1e-6).any(axis=1))
+        for i, value in zip(changed.tolist(), loc[changed].tolist()):
+            self.nodes[i].location = value
+        self.written[changed] = loc[changed]
+        self.stats.add_write(time.perf_counter() - start, len(changed))
+        return len(changed)
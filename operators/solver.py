@@ -0,0 +1,590 @@
+import copy
+import time
+
+import numpy as np
+
+from .components import SubTree, connected_components, pack, surroundings
+from .frames import FrameLevel, nested_order
+from .layering import place_layers, sweep_y_overlaps
+from .multilevel import coarsen
+from .reroutes import CollapsedTree, reroute_chains
+from .snapshot import concat_ranges
+from .spatial import candidate_pairs
+
+MOVE_UNIT = 1
+# Iterations a node has to stay put before it stops being solved
+SLEEP_ITERATIONS = 3
+# Iterations of stages 2 to 4 after placing a finer level from the coarser one
+REFINE_ITERATIONS = 30
+# Automatic schedule: over-relaxation of the link stages, and how much of it is kept after an overshoot
+AUTO_OMEGA = 1.6
+AUTO_BACKOFF = 0.5
+AUTO_FLOOR = 0.25
+# Iterations over which the collision stages ramp up their push
+AUTO_RAMP = 10
+# A stage ends once its residual has not improved by this fraction for AUTO_WINDOW iterations
+AUTO_STALL = 0.02
+AUTO_WINDOW = 10
+# Iterations a stage gets at most, per square root of the node count
+AUTO_ITERATIONS = 6
+
+
+class LinkSide:
+    """Input or output links of a node set, grouped by the owning node"""
+
+    def __init__(self, order, ptr, idx, used):
+        start = ptr[idx]
+        count = ptr[idx + 1] - start
+        self.links = order[concat_ranges(start, count)]
+        self.owner = np.repeat(np.arange(len(idx)), count)
+        if used is not None:
+            keep = used[self.links]
+            self.links = self.links[keep]
+            self.owner = self.owner[keep]
+        self.nodes, self.starts = np.unique(self.owner, return_index=True)
+        self.count = np.bincount(self.owner, minlength=len(idx))
+
+    def reduce(self, ufunc, values, node_cnt):
+        result = np.zeros(node_cnt)
+        if len(values):
+            result[self.nodes] = ufunc.reduceat(values, self.starts)
+        return result
+
+
+class LinkGroup:
+    """A set of nodes together with their input and output links"""
+
+    def __init__(self, snap, idx, pull_non_siblings=True):
+        self.idx = np.asarray(idx, dtype=np.int64)
+        self.pull_non_siblings = pull_non_siblings
+        links = snap.links
+        used = None if pull_non_siblings else links.siblings
+        self.inputs = LinkSide(links.in_order, links.in_ptr, self.idx, used)
+        self.outputs = LinkSide(links.out_order, links.out_ptr, self.idx, used)
+
+    def __len__(self):
+        return len(self.idx)
+
+
+def color_groups(snap, idx):
+    # Nodes of one color share no links, so relaxing them at once gives
+    # the same result as relaxing them one after another
+    links = snap.links
+    colors = {}
+    groups = []
+    for i in idx.tolist():
+        neighbours = np.concatenate((links.upstream(i), links.downstream(i))).tolist()
+        used = {colors[j] for j in neighbours if j in colors}
+        color = 0
+        while color in used:
+            color += 1
+        colors[i] = color
+        if color == len(groups):
+            groups.append([])
+        groups[color].append(i)
+
+    return [LinkGroup(snap, group) for group in groups]
+
+
+def relax_offsets(snap, group, distance, clamped_pull, centered):
+    pos = snap.pos
+    size = snap.size
+    links = snap.links
+    node_cnt = len(group)
+    loc = pos[group.idx]
+    own_size = size[group.idx]
+
+    # Input links
+    side = group.inputs
+    other = links.src[side.links]
+    x = pos[other, 0] + size[other, 0] + distance
+    local_slot, remote_slot = (0.5, 0.5) if centered else (links.dst_slot[side.links], links.src_slot[side.links])
+    y = pos[other, 1] + local_slot * own_size[side.owner, 1] - remote_slot * size[other, 1]
+    tar_x_in = side.reduce(np.maximum if clamped_pull else np.add, x, node_cnt)
+    tar_y = side.reduce(np.add, y, node_cnt)
+
+    # Output links
+    side = group.outputs
+    other = links.dst[side.links]
+    x = pos[other, 0] - own_size[side.owner, 0] - distance
+    local_slot, remote_slot = (0.5, 0.5) if centered else (links.src_slot[side.links], links.dst_slot[side.links])
+    y = pos[other, 1] + local_slot * own_size[side.owner, 1] - remote_slot * size[other, 1]
+    tar_x_out = side.reduce(np.minimum if clamped_pull else np.add, x, node_cnt)
+    tar_y += side.reduce(np.add, y, node_cnt)
+
+    has_input = group.inputs.count > 0
+    has_output = group.outputs.count > 0
+    link_cnt = group.inputs.count + group.outputs.count
+    linked = link_cnt > 0
+    if clamped_pull:
+        tar_x = tar_x_in * has_input + tar_x_out * has_output
+        tar_x[linked] /= has_input[linked].astype(int) + has_output[linked]
+    else:
+        tar_x = tar_x_in + tar_x_out
+        tar_x[linked] /= link_cnt[linked]
+    tar_y[linked] /= link_cnt[linked]
+
+    offset = np.zeros((node_cnt, 2))
+    offset[linked, 0] = tar_x[linked] - loc[linked, 0]
+    offset[linked, 1] = tar_y[linked] - loc[linked, 1]
+    return offset
+
+
+def collide_pairs(snap, a, b, dist, only_y):
+    # Push of node a out of node b along the axis with the smaller overlap
+    size_a = snap.size[a]
+    size_b = snap.size[b]
+    center_a = snap.pos[a] + size_a * (0.5, -0.5)
+    center_b = snap.pos[b] + size_b * (0.5, -0.5)
+
+    delta = center_b - center_a
+    inters = (size_a + size_b) / 2 + dist - np.abs(delta)
+    hit = (inters > 0).all(axis=1)
+    along_y = hit if only_y else hit & (inters[:, 1] < inters[:, 0])
+    along_x = hit & ~along_y
+
+    # Nodes at the same spot are pushed apart by index, not both the same way
+    tie = np.where(a < b, 1.0, -1.0)[:, None]
+    sign = np.where(delta > 0, -1.0, np.where(delta < 0, 1.0, tie))
+
+    push = np.zeros_like(delta)
+    push[along_x, 0] = sign[along_x, 0] * inters[along_x, 0] / 2
+    push[along_y, 1] = sign[along_y, 1] * inters[along_y, 1] / 2
+    return push
+
+
+def collision_offsets(snap, idx, dist, only_y, others=None, active=None):
+    if others is None:
+        others = snap.movable
+    owner, other = candidate_pairs(snap, idx, others, dist)
+    snap.stats.pairs += len(owner)
+    push = collide_pairs(snap, idx[owner], other, dist, only_y)
+    if active is not None:
+        active.touch(other[push.any(axis=1)])
+    offset = np.zeros((len(idx), 2))
+    offset[:, 0] = np.bincount(owner, push[:, 0], minlength=len(idx))
+    offset[:, 1] = np.bincount(owner, push[:, 1], minlength=len(idx))
+    return offset
+
+
+class ActiveSet:
+    """Nodes still being solved. A node that stopped moving sleeps until a linked or colliding node moves"""
+
+    def __init__(self, snap, idx, enabled):
+        self.snap = snap
+        self.idx = idx
+        self.enabled = enabled
+        self.solved = np.zeros(len(snap), dtype=bool)
+        self.solved[idx] = True
+        self.awake = np.zeros(len(snap), dtype=bool)
+        self.still = np.zeros(len(snap), dtype=np.int64)
+        self.begin_stage()
+
+    def begin_stage(self):
+        self.awake[self.idx] = True
+        self.still[:] = 0
+        self.begin_iteration()
+
+    def begin_iteration(self):
+        self.evaluated = []
+        self.moved = []
+        self.touched = []
+        self.square_sum = 0.0
+        self.largest = 0.0
+
+    def select(self, idx):
+        return idx[self.awake[idx]] if self.enabled else idx
+
+    def subgroup(self, group):
+        idx = self.select(group.idx)
+        if len(idx) == len(group):
+            return group
+        return LinkGroup(self.snap, idx, group.pull_non_siblings)
+
+    def record(self, idx, offset, moved):
+        self.evaluated.append(idx)
+        self.moved.append(idx[moved])
+        self.square_sum += float((offset[moved] ** 2).sum())
+        if len(offset):
+            self.largest = max(self.largest, float(np.abs(offset).max()))
+
+    def touch(self, idx):
+        # Nodes pushed against by a solved node, they wake up even if asleep
+        if self.enabled:
+            self.touched.append(idx)
+
+    def end_iteration(self):
+        # Returns the RMS offset of the moved nodes over all solved nodes, and whether the stage settled.
+        # Settling goes by the largest offset, one node still moving keeps the stage going in any tree size
+        evaluated = np.concatenate(self.evaluated) if self.evaluated else np.zeros(0, dtype=np.int64)
+        moved = np.concatenate(self.moved) if self.moved else np.zeros(0, dtype=np.int64)
+        touched = self.touched
+        residual = (self.square_sum / max(len(self.idx), 1)) ** 0.5
+        settled = self.largest <= MOVE_UNIT
+        self.begin_iteration()
+        if not self.enabled:
+            return residual, settled
+
+        self.still[evaluated] += 1
+        self.still[moved] = 0
+        self.awake[evaluated[self.still[evaluated] >= SLEEP_ITERATIONS]] = False
+        if len(moved) and not self.awake[self.idx].all():
+            # Wake the nodes the moved ones pull on or push against
+            woken = np.concatenate([self.snap.links.neighbours(moved)] + touched)
+            woken = woken[self.solved[woken]]
+            self.awake[woken] = True
+            self.still[woken] = 0
+        return residual, settled or self.asleep()
+
+    def asleep(self):
+        return not self.awake[self.idx].any()
+
+
+class Checkpoint:
+    """Where a single level arrange is, kept up to date while it runs so that it can continue from there later"""
+
+    def __init__(self, stage=1):
+        self.stage = stage
+        self.iteration = 0
+        self.root_center = None
+        self.active = None
+        self.schedule = None
+        self.awake = None
+        self.still = None
+        self.members = None  # Nodes of the part of the tree that is solved, the same ones when resuming
+        self.started = False
+
+    def first_iteration(self, stage):
+        # None if the stage is already done
+        if stage < self.stage:
+            return None
+        return self.iteration if stage == self.stage else 0
+
+    def reached(self, stage, iteration, active, schedule):
+        self.stage = stage
+        self.iteration = iteration
+        self.active = active
+        self.schedule = schedule
+
+    def stage_done(self, stage):
+        self.stage = stage + 1
+        self.iteration = 0
+        self.active = None
+        self.schedule = None
+
+    def freeze(self):
+        # Keep the active set and schedule as they are when the run stops
+        if self.active is not None:
+            self.awake = self.active.awake.copy()
+            self.still = self.active.still.copy()
+            self.schedule = copy.deepcopy(self.schedule)
+            self.active = None
+
+    def restore(self, active, schedule):
+        if self.awake is not None:
+            active.awake[:] = self.awake
+            active.still[:] = self.still
+            schedule.__dict__.update(self.schedule.__dict__)
+            self.awake = None
+            self.still = None
+            self.schedule = None
+
+
+class Schedule:
+    """Iteration count and step sizes of a stage as set in the panel"""
+
+    def __init__(self, iterations):
+        self.iterations = iterations
+        self.omega = 1
+
+    def ramp(self, i):
+        return i / self.iterations
+
+    def update(self, residual):
+        # True to end the stage early
+        return False
+
+
+class AutoSchedule(Schedule):
+    """Stage length and step sizes picked while solving.
+
+    omega scales the step of the stage that can overshoot. It starts at the given value
+    and is cut back towards floor whenever the residual grows because nodes swing back
+    and forth. Once the residual stops improving omega settles to floor, and the stage
+    ends when it stops improving again. A stage has at most a few iterations per square
+    root of the node count.
+    """
+
+    def __init__(self, iterations, node_cnt, omega, floor):
+        super().__init__(min(iterations, max(AUTO_RAMP + AUTO_WINDOW, int(AUTO_ITERATIONS * node_cnt ** 0.5))))
+        self.omega = omega
+        self.floor = floor
+        self.settling = False
+        self.residuals = []
+
+    def ramp(self, i):
+        return min(1, (i + 1) / AUTO_RAMP)
+
+    def update(self, residual):
+        residuals = self.residuals
+        if self.settling or (self.omega > 1 and residuals and residual > residuals[-1]):
+            self.omega = self.floor + (self.omega - self.floor) * AUTO_BACKOFF
+        residuals.append(residual)
+        if len(residuals) <= AUTO_RAMP + AUTO_WINDOW:
+            return False
+        if min(residuals[-AUTO_WINDOW:]) <= min(residuals[:-AUTO_WINDOW]) * (1 - AUTO_STALL):
+            return False
+        if self.settling or self.omega == self.floor:
+            return True
+        self.settling = True
+        self.residuals = []
+        return False
+
+
+def move(snap, idx, offset, influence):
+    moved = (np.abs(offset) > MOVE_UNIT).any(axis=1)
+    snap.stats.moved += int(moved.sum())
+    if moved.any():
+        if np.ndim(influence):
+            influence = influence[moved, None]
+        snap.pos[idx[moved]] += offset[moved] * influence
+    return moved
+
+
+def relax_pass(snap, groups, distance, clamped_pull, active, omega=1):
+    for group in groups:
+        group = active.subgroup(group)
+        if len(group) == 0:
+            continue
+        offset = relax_offsets(snap, group, distance, clamped_pull, False)
+        active.record(group.idx, offset, move(snap, group.idx, offset, omega))
+
+
+def collision_y_pass(snap, idx, collide_power, collide_dist, active):
+    idx = active.select(idx)
+    offset = collision_offsets(snap, idx, collide_dist, True, active=active)
+    active.record(idx, offset, move(snap, idx, offset, collide_power))
+
+
+def calc_pass(snap, group, influence, slide_vec, relax_power, collide_power, collide_dist, others=None, active=None):
+    if active is not None:
+        group = active.subgroup(group)
+    offset = np.zeros((len(group), 2))
+    offset += slide_vec
+    if relax_power > 0:
+        offset += relax_offsets(snap, group, collide_dist[0], True, True) * relax_power
+    if collide_power > 0:
+        offset += collision_offsets(snap, group.idx, collide_dist, False, others, active) * collide_power
+    moved = move(snap, group.idx, offset, influence)
+    if active is not None:
+        active.record(group.idx, offset, moved)
+    return moved
+
+
+def single_pass(snap, step_num, checkpoint, func):
+    # Stage replaced by a direct computation, recorded as one iteration
+    if checkpoint.first_iteration(step_num) is None:
+        return
+    snap.stats.begin_stage("S%d" % step_num, 1)
+    start = time.perf_counter()
+    func()
+    checkpoint.stage_done(step_num)
+    snap.stats.end_iteration(time.perf_counter() - start)
+    yield step_num, 0, 1
+
+
+def step(snap, step_num, schedule, idx, props, center, active, checkpoint, iter_func):
+    iter_num = schedule.iterations
+    if iter_num == 0:
+        return
+    first = checkpoint.first_iteration(step_num)
+    if first is None:
+        return
+    snap.stats.begin_stage("S%d" % step_num, iter_num)
+    active.begin_stage()
+    if first:
+        checkpoint.restore(active, schedule)
+    for i in range(first, iter_num):
+        start = time.perf_counter()
+        iter_func(schedule.ramp(i))
+        residual, converged = active.end_iteration()
+        converged = converged and props.AdaptiveIters or schedule.update(residual)
+        if not converged and center is not None:
+            slide = center - snap.pos[idx].mean(axis=0)  # Keep Center
+            snap.pos[snap.movable] += slide
+        snap.stats.end_iteration(time.perf_counter() - start)
+        if converged:
+            break
+        checkpoint.reached(step_num, i + 1, active, schedule)
+        yield step_num, i, iter_num
+    checkpoint.stage_done(step_num)
+
+
+def arrange_level(snap, props, iterations, idx, keep_center, checkpoint=None):
+    if len(idx) == 0:
+        return
+    if checkpoint is None:
+        checkpoint = Checkpoint()
+    checkpoint.started = True
+    if checkpoint.root_center is None:
+        checkpoint.root_center = snap.pos[idx].mean(axis=0)  # Original Center
+    root_center = checkpoint.root_center
+    center = root_center if keep_center else None
+    distance = props.Distance
+    active = ActiveSet(snap, idx, props.ActiveSet)
+
+    if props.AutoSchedule:
+        schedules = [AutoSchedule(n, len(idx), omega, floor)
+                     for n, omega, floor in zip(iterations, (AUTO_OMEGA, AUTO_OMEGA, 1, 1), (1, 1, 1, 0.5))]
+    else:
+        schedules = [Schedule(n) for n in iterations]
+
+    colors = color_groups(snap, idx)
+    if not props.LayeredStart:
+        yield from step(snap, 1, schedules[0], idx, props, center, active, checkpoint,
+                        lambda t: relax_pass(snap, colors, distance, False, active, schedules[0].omega))
+    elif iterations[0]:
+        def place():
+            place_layers(snap, idx, distance)
+            snap.pos[idx] += root_center - snap.pos[idx].mean(axis=0)
+        yield from single_pass(snap, 1, checkpoint, place)
+
+    yield from step(snap, 2, schedules[1], idx, props, center, active, checkpoint,
+                    lambda t: relax_pass(snap, colors, distance, True, active, schedules[1].omega))
+
+    dist = np.array((0, distance))
+    if not props.SweepStage3:
+        yield from step(snap, 3, schedules[2], idx, props, center, active, checkpoint,
+                        lambda t: collision_y_pass(snap, idx, t, dist, active))
+    elif iterations[2]:
+        yield from single_pass(snap, 3, checkpoint, lambda: sweep_y_overlaps(snap, idx, distance))
+
+    dist = np.array((distance, distance))
+    zero_vec = np.zeros(2)
+    group = LinkGroup(snap, idx)
+    yield from step(snap, 4, schedules[3], idx, props, center, active, checkpoint,
+                    lambda t: calc_pass(snap, group, min(1, t * 2), zero_vec, 0.2 * schedules[3].omega, 1, dist,
+                                        active=active))
+
+
+def arrange(snap, props, idx=None, checkpoint=None):
+    """Run the four arrange stages on a snapshot, yielding (stage, iteration, iterations) after each iteration.
+
+    Only the nodes in idx are moved if given, the rest of the tree stays where it is.
+    In multilevel mode the stages first run on the coarsest level, every finer
+    level then starts from the coarser layout and is refined with a few iterations.
+    A single level run starts where checkpoint says and keeps it up to date.
+    Chains of reroutes can be left out of a whole tree run and lined up along their links after it.
+    """
+    # The whole tree is kept centered, a part of it is arranged in place
+    keep_center = idx is None and not props.ArrangeOnlySelected
+    if idx is None:
+        idx = snap.solve_indices(props.ArrangeOnlySelected)
+    if not keep_center:
+        yield from arrange_part(snap, props, idx, checkpoint)
+    elif props.NestedFrames:
+        yield from arrange_nested(snap, props)
+    elif props.CollapseReroutes and snap.is_reroute.any():
+        yield from arrange_collapsed(snap, props, checkpoint)
+    else:
+        yield from arrange_whole(snap, props, idx, checkpoint)
+
+
+def arrange_whole(snap, props, idx, checkpoint=None):
+    if props.SplitComponents:
+        yield from arrange_components(snap, props, idx)
+    else:
+        yield from arrange_tree(snap, props, idx, True, checkpoint)
+
+
+def arrange_collapsed(snap, props, checkpoint=None):
+    # Chains of reroutes are left out of the solve and put back along their links afterwards
+    chains = reroute_chains(snap)
+    if not chains:
+        yield from arrange_whole(snap, props, snap.movable, checkpoint)
+        return
+    tree = CollapsedTree(snap, chains)
+    for progress in arrange_whole(tree, props, tree.movable, checkpoint):
+        tree.commit(0)  # Preview
+        yield progress
+    tree.commit(0)
+
+
+def arrange_tree(snap, props, idx, keep_center, checkpoint=None, iterations=None):
+    if iterations is None:
+        iterations = (props.Iterations_S1, props.Iterations_S2, props.Iterations_S3, props.Iterations_S4)
+    if not props.Multilevel:
+        yield from arrange_level(snap, props, iterations, idx, keep_center, checkpoint)
+        return
+
+    levels = coarsen(snap, idx, props.Distance)
+    refine = (0,) + tuple(min(n, REFINE_ITERATIONS) for n in iterations[1:])
+    outer = snap.stats.prefix
+    for depth in range(len(levels), -1, -1):
+        level = levels[depth - 1] if depth else snap
+        snap.stats.prefix = outer + "L%d " % depth if levels else outer
+        level_idx = level.idx if depth else idx
+        yield from arrange_level(level, props, iterations if depth == len(levels) else refine, level_idx, keep_center)
+        if depth:
+            level.prolong()
+    snap.stats.prefix = outer
+
+
+def arrange_part(snap, props, idx, checkpoint=None):
+    # Only idx and the nodes around it are solved, those stay in place and the rest of the tree is left out.
+    # Stages 1 and 2 only pull on links, the nodes in the way are looked up for stages 3 and 4,
+    # around where the nodes of idx are by then
+    if len(idx) == 0:
+        return
+    if checkpoint is None:
+        checkpoint = Checkpoint()
+    iterations = (props.Iterations_S1, props.Iterations_S2, props.Iterations_S3, props.Iterations_S4)
+    near = np.setdiff1d(snap.links.neighbours(idx), idx)
+    for first, last in ((1, 2), (3, 4)):
+        if first == 1:
+            members = np.concatenate((idx, near))
+        else:
+            if checkpoint.members is None:
+                checkpoint.members = np.concatenate((idx, surroundings(snap, idx, props.Distance)))
+            members = checkpoint.members
+        part = SubTree(snap, members)
+        part_iterations = tuple(n if first <= stage <= last else 0 for stage, n in enumerate(iterations, 1))
+        for progress in arrange_tree(part, props, np.arange(len(idx)), False, checkpoint, part_iterations):
+            part.commit(0)  # Preview
+            yield progress
+        part.commit(0)
+
+
+def arrange_components(snap, props, idx):
+    # Unlinked parts of the tree are arranged one by one, each until it converges, then packed in rows
+    if len(idx) == 0:
+        return
+    parts = [SubTree(snap, nodes) for nodes in connected_components(snap, idx)]
+    centers = np.array([snap.pos[part.members[part.movable]].mean(axis=0) for part in parts])
+    root_center = snap.pos[idx].mean(axis=0)
+    outer = snap.stats.part
+    for number, part in enumerate(parts):
+        if len(part.movable) > 1:
+            snap.stats.part = outer + "C%d " % number
+            yield from arrange_tree(part, props, part.movable, True)
+    snap.stats.part = outer
+
+    boxes = [part.bounds() for part in parts]
+    corners = pack(np.array([size for _, size in boxes]), centers, props.Distance)
+    for part, (corner, _), target in zip(parts, boxes, corners):
+        part.commit(target - corner)
+    snap.pos[idx] += root_center - snap.pos[idx].mean(axis=0)
+
+
+def arrange_nested(snap, props):
+    # Every frame is arranged on its own, from the innermost out, with its inner frames as rigid blocks
+    for frame in nested_order(snap):
+        level = FrameLevel(snap, frame)
+        if len(level) > 1:
+            snap.stats.part = "F%d " % frame if frame >= 0 else "Top "
+            if props.SplitComponents:
+                yield from arrange_components(level, props, level.movable)
+            else:
+                yield from arrange_tree(level, props, level.movable, True)
+            level.commit()
+    snap.stats.part = ""
@@ -0,0 +1,110 @@
+import numpy as np
+
+from .snapshot import concat_ranges
+
+# Below this many node pairs candidate_pairs returns them all
+ALL_PAIRS_LIMIT = 4096
+
+
+def cell_size(size, dist):
+    # Typical node extent plus the gap, so most nodes cover one to four cells
+    typical = float(np.median(size.max(axis=1))) if len(size) else 0
+    return max(typical + float(np.max(dist)), 1.0)
+
+
+def grid_bounds(snap, idx, dist, cell):
+    # First and last cell covered by the node rectangle grown by half the distance on every side
+    x, y = snap.pos[idx].T
+    w, h = snap.size[idx].T
+    lo = np.stack((x - dist[0] / 2, y - h - dist[1] / 2), axis=1)
+    hi = np.stack((x + w + dist[0] / 2, y + dist[1] / 2), axis=1)
+    return np.floor(lo / cell).astype(np.int64), np.floor(hi / cell).astype(np.int64)
+
+
+def expand_cells(lo, hi):
+    # One entry per covered cell: owner, cell x, cell y
+    span = hi - lo + 1
+    count = span[:, 0] * span[:, 1]
+    owner = np.repeat(np.arange(len(lo)), count)
+    k = concat_ranges(np.zeros_like(count), count)
+    column = span[owner, 1]
+    return owner, lo[owner, 0] + k // column, lo[owner, 1] + k % column
+
+
+def candidate_pairs(snap, idx, others, dist):
+    """Pairs of a node in idx (as position in idx) and a node in others (as node index) sharing a grid cell"""
+    empty = np.zeros(0, dtype=np.int64)
+    if len(idx) == 0 or len(others) == 0:
+        return empty, empty
+    if len(idx) * len(others) <= ALL_PAIRS_LIMIT:
+        # Few nodes, testing every pair is cheaper than building the grid
+        owner = np.repeat(np.arange(len(idx)), len(others))
+        other = np.tile(others, len(idx))
+        keep = idx[owner] != other
+        return owner[keep], other[keep]
+
+    cell = cell_size(snap.size[others], dist)
+    lo_a, hi_a = grid_bounds(snap, idx, dist, cell)
+    lo_b, hi_b = grid_bounds(snap, others, dist, cell)
+    owner_a, x_a, y_a = expand_cells(lo_a, hi_a)
+    owner_b, x_b, y_b = expand_cells(lo_b, hi_b)
+
+    corner = np.minimum(lo_a.min(axis=0), lo_b.min(axis=0))
+    rows = max(hi_a[:, 1].max(), hi_b[:, 1].max()) - corner[1] + 1
+    key_a = (x_a - corner[0]) * rows + (y_a - corner[1])
+    key_b = (x_b - corner[0]) * rows + (y_b - corner[1])
+    order = np.argsort(key_b, kind='stable')
+    key_b = key_b[order]
+    owner_b = owner_b[order]
+
+    left = np.searchsorted(key_b, key_a, 'left')
+    count = np.searchsorted(key_b, key_a, 'right') - left
+    entry = np.repeat(np.arange(len(key_a)), count)
+    other = concat_ranges(left, count)
+
+    a = owner_a[entry]
+    b = owner_b[other]
+    # Rectangles can share several cells, keep the pair only in the cell where their overlap starts
+    keep = idx[a] != others[b]
+    keep &= x_a[entry] == np.maximum(lo_a[a, 0], lo_b[b, 0])
+    keep &= y_a[entry] == np.maximum(lo_a[a, 1], lo_b[b, 1])
+    return a[keep], others[b[keep]]
+
+
+class NodeGrid:
+    """Grid of node rectangles for box queries, updated only for the nodes that moved"""
+
+    def __init__(self, snap, idx):
+        self.snap = snap
+        self.cell = cell_size(snap.size[idx], (0, 0))
+        self.cells = {}  # (x, y) -> node indices
+        self.bounds = {}  # node index -> first and last cell
+        self.update(idx)
+
+    def update(self, idx):
+        lo, hi = grid_bounds(self.snap, idx, (0, 0), self.cell)
+        for i, first, last in zip(np.asarray(idx).tolist(), lo.tolist(), hi.tolist()):
+            bounds = (tuple(first), tuple(last))
+            old = self.bounds.get(i)
+            if old == bounds:
+                continue
+            if old is not None:
+                for key in self.cell_range(*old):
+                    self.cells[key].discard(i)
+            for key in self.cell_range(*bounds):
+                self.cells.setdefault(key, set()).add(i)
+            self.bounds[i] = bounds
+
+    @staticmethod
+    def cell_range(first, last):
+        for x in range(first[0], last[0] + 1):
+            for y in range(first[1], last[1] + 1):
+                yield x, y
+
+    def query(self, lo, hi):
+        first = tuple(int(v) for v in np.floor(np.asarray(lo) / self.cell))
+        last = tuple(int(v) for v in np.floor(np.asarray(hi) / self.cell))
+        found = set()
+        for key in self.cell_range(first, last):
+            found.update(self.cells.get(key, ()))
+        return np.array(sorted(found), dtype=np.int64)
@@ -0,0 +1,80 @@
+# Stats of the last run by kind ("arrange", "brush"), shown in the panels and exported as JSON
+last = {}
+
+
+class SolverStats:
+    """Timings and counters of one arrange run or brush session, grouped by stage"""
+
+    def __init__(self):
+        self.stages = []
+        self.stage = None
+        self.prefix = ""  # Prepended to stage names, e.g. the level of a multilevel arrange
+        self.part = ""  # Island or frame the stages belong to, left out of the panel summary
+        self.snapshot_seconds = 0.0
+        self.write_seconds = 0.0
+        self.written_nodes = 0
+        self.moved = 0
+        self.pairs = 0
+        self.last_seconds = 0.0
+
+    def begin_stage(self, name, max_iterations):
+        self.stage = {
+            "stage": self.part + self.prefix + name,
+            "group": self.prefix + name,
+            "seconds": 0.0,
+            "iterations": 0,
+            "max_iterations": max_iterations,
+            "moved_nodes": [],
+            "collision_pairs": [],
+        }
+        self.stages.append(self.stage)
+
+    def end_iteration(self, seconds):
+        self.last_seconds = seconds
+        if self.stage is not None:
+            self.stage["seconds"] += seconds
+            self.stage["iterations"] += 1
+            self.stage["moved_nodes"].append(self.moved)
+            self.stage["collision_pairs"].append(self.pairs)
+        self.moved = 0
+        self.pairs = 0
+
+    def add_write(self, seconds, nodes):
+        self.write_seconds += seconds
+        self.written_nodes += nodes
+
+    def report(self):
+        stages = []
+        for stage in self.stages:
+            iterations = max(stage["iterations"], 1)
+            stages.append(dict(stage,
+                               moved_per_iteration=sum(stage["moved_nodes"]) / iterations,
+                               pairs_per_iteration=sum(stage["collision_pairs"]) / iterations))
+        return {
+            "snapshot_seconds": self.snapshot_seconds,
+            "write_seconds": self.write_seconds,
+            "written_nodes": self.written_nodes,
+            "stages": stages,
+        }
+
+    def summary_lines(self):
+        # One line per stage, the runs of a stage in every island and frame summed up
+        groups = {}
+        for stage in self.stages:
+            group = groups.setdefault(stage["group"], {"seconds": 0.0, "iterations": 0, "max_iterations": 0,
+                                                       "moved": 0, "pairs": 0, "parts": 0})
+            group["seconds"] += stage["seconds"]
+            group["iterations"] += stage["iterations"]
+            group["max_iterations"] += stage["max_iterations"]
+            group["moved"] += sum(stage["moved_nodes"])
+            group["pairs"] += sum(stage["collision_pairs"])
+            group["parts"] += 1
+        lines = []
+        for name, group in groups.items():
+            iterations = max(group["iterations"], 1)
+            lines.append("%s%s: %.2fs  %d/%d it  %.1f moved  %.0f pairs" % (
+                name, " (%d parts)" % group["parts"] if group["parts"] > 1 else "", group["seconds"],
+                group["iterations"], group["max_iterations"], group["moved"] / iterations, group["pairs"] / iterations))
+        lines.append("Read: %.3fs  Write: %.3fs (%d)" % (self.snapshot_seconds, self.write_seconds, self.written_nodes))
+        return lines
+
@@ -0,0 +1,100 @@
+"""Brush strokes recorded in the node editor, and replayed without Blender to time them"""
+import pickle
+import time
+
+import numpy as np
+
+from .solver import LinkGroup, calc_pass
+from .spatial import NodeGrid
+from .stats import SolverStats
+
+# One row per brush tick
+EVENT_FIELDS = ("cursor_x", "cursor_y", "slide_x", "slide_y", "radius", "lmb", "drag_mode", "dragging_node",
+                "relax_power", "slide_power", "collision_power", "distance")
+FIELD = {name: i for i, name in enumerate(EVENT_FIELDS)}
+
+
+def brush_influence(cursor, radius, loc, size):
+    delta_x = cursor[0] - np.clip(cursor[0], loc[:, 0], loc[:, 0] + size[:, 0])
+    delta_y = cursor[1] - np.clip(cursor[1], loc[:, 1] - size[:, 1], loc[:, 1])
+    dist_sqr = delta_x * delta_x + delta_y * delta_y
+    return 1 - (dist_sqr / (radius * radius))
+
+
+def brush_pass(snap, grid, cursor, radius, slide_vec, relax_power, slide_power, collision_power, distance):
+    """Relax the nodes under the brush, returns the moved nodes or None if the brush is over empty space"""
+    idx = grid.query(cursor - radius, cursor + radius)
+    if len(idx) == 0:
+        return None
+    infl = brush_influence(cursor, radius, snap.pos[idx], snap.size[idx])
+    inside = infl > 0
+    if not inside.any():
+        return None
+    idx = idx[inside]
+
+    dist = np.array((distance, distance))
+    loc = snap.pos[idx]
+    size = snap.size[idx]
+    others = grid.query((loc - size * (0, 1)).min(axis=0) - dist, (loc + size * (1, 0)).max(axis=0) + dist)
+    group = LinkGroup(snap, idx, pull_non_siblings=False)
+    calc_pass(snap, group, infl[inside], slide_vec * slide_power, relax_power, collision_power, dist, others)
+    return idx
+
+
+class StrokeRecorder:
+    """Brush ticks of one stroke together with the node layout it started from"""
+
+    def __init__(self, snap):
+        self.snap = snap
+        self.start = snap.pos.copy()
+        self.events = []
+
+    def record(self, cursor, slide_vec, radius, lmb, drag_mode, dragging_node, props):
+        self.events.append((cursor[0], cursor[1], slide_vec[0], slide_vec[1], radius, lmb, drag_mode,
+                            -1 if dragging_node is None else dragging_node,
+                            props.RelaxPower, props.SlidePower, props.CollisionPower, props.Distance))
+
+    def save(self, path):
+        # The snapshot pickles without its Blender nodes, so it loads without Blender
+        events = np.array(self.events, dtype=np.float32).reshape(-1, len(EVENT_FIELDS))
+        with open(path, "wb") as f:
+            pickle.dump({"snapshot": self.snap, "start": self.start, "events": events}, f,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def load_stroke(path):
+    """Snapshot set back to the start of the stroke, and its events"""
+    with open(path, "rb") as f:
+        data = pickle.load(f)
+    snap = data["snapshot"]
+    snap.pos = data["start"].copy()
+    snap.stats = SolverStats()
+    return snap, data["events"]
+
+
+def replay(snap, events):
+    """Run the recorded ticks again on snap, returns the seconds every tick took.
+
+    Writing the nodes back to Blender and picking the dragged node are not part of it,
+    the dragged node is taken from the recording.
+    """
+    grid = NodeGrid(snap, snap.movable)
+    snap.stats.begin_stage("Brush", 0)
+    seconds = np.zeros(len(events))
+    for i, event in enumerate(events.astype(np.float64)):
+        start = time.perf_counter()
+        cursor = event[[FIELD["cursor_x"], FIELD["cursor_y"]]]
+        slide_vec = event[[FIELD["slide_x"], FIELD["slide_y"]]]
+        node = int(event[FIELD["dragging_node"]])
+        if event[FIELD["drag_mode"]]:
+            if event[FIELD["lmb"]] and node >= 0:
+                snap.pos[node] += slide_vec
+                grid.update([node])
+        elif event[FIELD["lmb"]]:
+            idx = brush_pass(snap, grid, cursor, event[FIELD["radius"]], slide_vec, event[FIELD["relax_power"]],
+                             event[FIELD["slide_power"]], event[FIELD["collision_power"]], event[FIELD["distance"]])
+            if idx is not None:
+                grid.update(idx)
+        seconds[i] = time.perf_counter() - start
+        snap.stats.end_iteration(seconds[i])
+    return seconds
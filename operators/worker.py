@@ -0,0 +1,67 @@
+import copy
+import threading
+import time
+
+from .solver import arrange
+
+# Seconds between two sets of positions handed to the preview
+PREVIEW_INTERVAL = 0.1
+
+
+class SolverThread(threading.Thread):
+    """Arranges a copy of the snapshot off the main thread and publishes its latest positions now and then.
+
+    Only the copy is touched, the main thread reads the published positions and writes them to the tree.
+    Moving a frame changes the offsets of its children, so those are published along with the positions.
+    The stats stay shared, the solver fills them in while the main thread adds its writes.
+    """
+
+    def __init__(self, snap, settings, idx=None, checkpoint=None):
+        super().__init__(daemon=True)
+        self.snap = copy.copy(snap)
+        self.snap.pos = snap.pos.copy()
+        self.snap.offset = snap.offset.copy()
+        self.snap.written = snap.written.copy()
+        self.settings = settings
+        self.idx = idx
+        self.checkpoint = checkpoint
+        self.lock = threading.Lock()
+        self.cancelled = threading.Event()
+        self.version = 0
+        self.pos = None
+        self.offset = None
+        self.progress = None
+        self.error = None
+
+    def run(self):
+        last = time.perf_counter()
+        try:
+            for progress in arrange(self.snap, self.settings, self.idx, self.checkpoint):
+                if self.cancelled.is_set():
+                    return
+                now = time.perf_counter()
+                if now - last >= PREVIEW_INTERVAL:
+                    self.publish(progress)
+                    last = now
+            self.publish(None)
+        except Exception as error:
+            self.error = error
+
+    def publish(self, progress):
+        pos = self.snap.pos.copy()
+        offset = self.snap.offset.copy()
+        with self.lock:
+            self.pos = pos
+            self.offset = offset
+            self.progress = progress
+            self.version += 1
+
+    def latest(self):
+        """Version, positions, offsets and (stage, iteration, iterations) of the last published result"""
+        with self.lock:
+            return self.version, self.pos, self.offset, self.progress
+
+    def cancel(self):
+        # The solver checks for this between iterations
+        self.cancelled.set()
+        self.join()
@@ -1,5 +1,7 @@
 from bpy.types import Panel
 
+from ..operators import stats
+
 
 class NodeRelaxArrangePanel(Panel):
     """Node Arrange Panel"""
@@ -16,13 +18,39 @@ class NodeRelaxArrangePanel(Panel):
         if len(props.ArrangeState) > 0:
             layout.label(text=props.ArrangeState)
         layout.prop(props, "ArrangeOnlySelected")
+        layout.prop(props, "Incremental")
+        layout.prop(props, "WarmStart")
         layout.separator()
         layout.label(text="Max Iterations:")
         box = layout.box()
-        box.prop(props, "Iterations_S1")
+        row = box.row()
+        row.active = not props.LayeredStart
+        row.prop(props, "Iterations_S1")
         box.prop(props, "Iterations_S2")
-        box.prop(props, "Iterations_S3")
+        row = box.row()
+        row.active = not props.SweepStage3
+        row.prop(props, "Iterations_S3")
         box.prop(props, "Iterations_S4")
         box.prop(props, "AdaptiveIters")
-        # layout.separator()
-        # layout.prop(props, "BackgroundIterations")
+        box.prop(props, "AutoSchedule")
+        box.prop(props, "LayeredStart")
+        box.prop(props, "SweepStage3")
+        box.prop(props, "ActiveSet")
+        box.prop(props, "Multilevel")
+        box.prop(props, "SplitComponents")
+        box.prop(props, "NestedFrames")
+        box.prop(props, "CollapseReroutes")
+        layout.prop(props, "BackgroundSolve")
+        row = layout.row()
+        row.active = not props.BackgroundSolve
+        row.prop(props, "TickBudget")
+        layout.prop(props, "UseLayoutCache")
+        if props.UseLayoutCache:
+            layout.prop(props, "LayoutCacheDir")
+        if "arrange" in stats.last:
+            layout.separator()
+            layout.label(text="Stats:")
+            box = layout.box()
+            for line in stats.last["arrange"].summary_lines():
+                box.label(text=line)
+            layout.operator("node_relax.export_stats")
@@ -21,4 +21,9 @@ class NodeRelaxBrushPanel(Panel):
         box = layout.box()
         box.prop(props, "RelaxPower")
         box.prop(props, "SlidePower")
-        box.prop(props, "CollisionPower")
\ No newline at end of file
+        box.prop(props, "CollisionPower")
+        layout.prop(props, "BrushRate")
+        layout.prop(props, "RecordBrush")
+        if props.RecordBrush:
+            layout.prop(props, "BrushStrokeFile")
+        layout.prop(props, "ShowStats")
\ No newline at end of file